@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Compare access_nested_maps with a per-call access_nested_map loop.
+
+Run from this directory: python3 bench_access_nested_map.py [records]
+"""
+import sys
+import time
+from utils import access_nested_map, access_nested_maps
+
+PATHS = [("name",), ("license", "key"), ("owner", "login")]
+
+
+def make_records(count):
+    return [
+        {
+            "name": f"repo{i}",
+            "license": {"key": "mit"} if i % 3 else None,
+            "owner": {"login": f"org{i % 50}"},
+        }
+        for i in range(count)
+    ]
+
+
+def per_call(records):
+    rows = []
+    for record in records:
+        row = []
+        for path in PATHS:
+            try:
+                row.append(access_nested_map(record, path))
+            except (KeyError, TypeError):
+                row.append(None)
+        rows.append(tuple(row))
+    return rows
+
+
+def best_of(func, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000, result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300000
+    records = make_records(count)
+    loop_ms, expected = best_of(lambda: per_call(records))
+    batch_ms, rows = best_of(
+        lambda: access_nested_maps(records, PATHS, default=None)
+    )
+    columns_ms, _ = best_of(
+        lambda: access_nested_maps(records, PATHS, default=None, columnar=True)
+    )
+    assert rows == expected
+    print(f"access_nested_map over {count} records x {len(PATHS)} paths")
+    print(f"  {'per-call loop':<24} {loop_ms:>10.1f} ms")
+    print(f"  {'batch rows':<24} {batch_ms:>10.1f} ms")
+    print(f"  {'batch columns':<24} {columns_ms:>10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
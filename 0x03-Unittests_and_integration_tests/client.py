@@ -1,28 +1,138 @@
 #!/usr/bin/env python3
-from typing import Any, Dict, List
-from .utils import get_json, memoize
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+import requests
+from .utils import (
+    ResponseCache, get_json, get_json_async, get_json_page, get_json_page_async,
+    memoize,
+)
+
+ORG_URL = "https://api.github.com/orgs/{org}"
 
 
 class GithubOrgClient:
-    def __init__(self, org_name: str) -> None:
+    def __init__(self, org_name: str,
+                 cache: Optional[ResponseCache] = None) -> None:
         self._org_name = org_name
+        self._cache = cache
 
-    @property
+    @memoize
     def org(self) -> Dict[str, Any]:
-        return get_json(f"https://api.github.com/orgs/{self._org_name}")
+        url = ORG_URL.format(org=self._org_name)
+        if self._cache is not None:
+            return self._cache.get_json(url)
+        return get_json(url)
 
     @memoize
     def _public_repos_url(self) -> str:
         return self.org["repos_url"]
 
     def public_repos(self, license: str | None = None) -> List[str]:
-        repos = get_json(self._public_repos_url)
-        names = [repo["name"] for repo in repos]
-        if license is None:
-            return names
-        return [r["name"] for r in repos if self.has_license(r, license)]
+        return list(self.iter_public_repos(license))
+
+    def iter_public_repos(self, license: str | None = None,
+                          prefetch: bool = False) -> Iterator[str]:
+        """
+        Yield repo names page by page, following `Link: rel="next"`.
+
+        With `prefetch` the next page is requested in the background while
+        the current one is consumed.
+        """
+        for repos in self._iter_repo_pages(prefetch):
+            for repo in repos:
+                if license is None or self.has_license(repo, license):
+                    yield repo["name"]
+
+    def _get_json_page(self, url: str):
+        if self._cache is not None:
+            return self._cache.get_json_page(url)
+        return get_json_page(url)
+
+    def _iter_repo_pages(self, prefetch: bool) -> Iterator[List[Dict[str, Any]]]:
+        url: Optional[str] = self._public_repos_url
+        if not prefetch:
+            while url:
+                repos, url = self._get_json_page(url)
+                yield repos
+            return
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(self._get_json_page, url)
+            while future is not None:
+                repos, url = future.result()
+                future = executor.submit(self._get_json_page, url) if url else None
+                yield repos
 
     @staticmethod
     def has_license(repo: Dict[str, Any], license_key: str) -> bool:
         license_info = repo.get("license") or {}
         return license_info.get("key") == license_key
+
+
+class AsyncGithubOrgClient:
+    """Asyncio counterpart of GithubOrgClient sharing the pooled session."""
+
+    def __init__(self, org_name: str,
+                 session: Optional[requests.Session] = None,
+                 cache: Optional[ResponseCache] = None) -> None:
+        self._org_name = org_name
+        self._session = session
+        self._cache = cache
+        self._org: Optional[Dict[str, Any]] = None
+
+    async def org(self) -> Dict[str, Any]:
+        if self._org is None:
+            url = ORG_URL.format(org=self._org_name)
+            if self._cache is not None:
+                self._org = await asyncio.to_thread(
+                    self._cache.get_json, url, self._session
+                )
+            else:
+                self._org = await get_json_async(url, self._session)
+        return self._org
+
+    async def public_repos(self, license: str | None = None) -> List[str]:
+        org = await self.org()
+        url: Optional[str] = org["repos_url"]
+        names: List[str] = []
+        while url:
+            if self._cache is not None:
+                repos, url = await asyncio.to_thread(
+                    self._cache.get_json_page, url, self._session
+                )
+            else:
+                repos, url = await get_json_page_async(url, self._session)
+            names.extend(
+                repo["name"] for repo in repos
+                if license is None or GithubOrgClient.has_license(repo, license)
+            )
+        return names
+
+    @classmethod
+    async def fetch_public_repos(
+        cls, org_names: Iterable[str], license: str | None = None,
+        concurrency: int = 10,
+        session: Optional[requests.Session] = None,
+        cache: Optional[ResponseCache] = None,
+    ) -> Dict[str, Union[List[str], Exception]]:
+        """
+        Fetch many orgs' public repos with at most `concurrency` in flight.
+
+        An org whose fetch fails maps to its exception, so one bad org does
+        not discard the results of the others.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(org_name: str) -> List[str]:
+            async with semaphore:
+                return await cls(org_name, session, cache).public_repos(license)
+
+        org_names = list(org_names)
+        results = await asyncio.gather(
+            *(fetch(name) for name in org_names), return_exceptions=True
+        )
+        for result in results:
+            # Cancellation and interpreter exits are not per-org failures.
+            if isinstance(result, BaseException) and not isinstance(result, Exception):
+                raise result
+        return dict(zip(org_names, results))
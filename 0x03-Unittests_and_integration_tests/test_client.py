@@ -1,9 +1,13 @@
 #!/usr/bin/env python3
 """Test client module."""
+import asyncio
+import json
+import threading
 import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from parameterized import parameterized, parameterized_class
 from unittest.mock import patch, PropertyMock
-from .client import GithubOrgClient
+from .client import GithubOrgClient, AsyncGithubOrgClient
 from . import client
 from .fixtures import org_payload, repos_payload, expected_repos, apache2_repos
 
@@ -22,6 +26,15 @@ class TestGithubOrgClient(unittest.TestCase):
         url = f"https://api.github.com/orgs/{org_name}"
         mock_get_json.assert_called_once_with(url)
 
+    @patch.object(client, 'get_json')
+    def test_org_memoized(self, mock_get_json):
+        """Test the org payload is fetched once per client."""
+        mock_get_json.return_value = org_payload
+        client_obj = GithubOrgClient("google")
+        self.assertEqual(client_obj.org, org_payload)
+        self.assertEqual(client_obj._public_repos_url, org_payload["repos_url"])
+        mock_get_json.assert_called_once()
+
     def test_public_repos_url(self):
         """Test _public_repos_url property."""
         with patch.object(
@@ -32,10 +45,10 @@ class TestGithubOrgClient(unittest.TestCase):
             client_obj = GithubOrgClient("google")
             self.assertEqual(client_obj._public_repos_url, repos_url)
 
-    @patch.object(client, 'get_json')
-    def test_public_repos(self, mock_get_json):
+    @patch.object(client, 'get_json_page')
+    def test_public_repos(self, mock_get_json_page):
         """Test public_repos method."""
-        mock_get_json.return_value = repos_payload
+        mock_get_json_page.return_value = (repos_payload, None)
         with patch.object(
                 GithubOrgClient, "_public_repos_url", new_callable=PropertyMock
         ) as mock_url:
@@ -44,7 +57,35 @@ class TestGithubOrgClient(unittest.TestCase):
             client_obj = GithubOrgClient("google")
             self.assertEqual(client_obj.public_repos(), expected_repos)
             mock_url.assert_called_once()
-            mock_get_json.assert_called_once_with(repos_url)
+            mock_get_json_page.assert_called_once_with(repos_url)
+
+    @parameterized.expand([
+        (False,),
+        (True,),
+    ])
+    @patch.object(client, 'get_json_page')
+    def test_public_repos_follows_pages(self, prefetch, mock_get_json_page):
+        """Test every page is fetched and the license filter applied."""
+        pages = {
+            "http://example.com/repos?page=1": (
+                [{"name": "a", "license": {"key": "mit"}}],
+                "http://example.com/repos?page=2",
+            ),
+            "http://example.com/repos?page=2": (
+                [{"name": "b"}, {"name": "c", "license": {"key": "mit"}}],
+                None,
+            ),
+        }
+        mock_get_json_page.side_effect = pages.__getitem__
+        with patch.object(
+                GithubOrgClient, "_public_repos_url", new_callable=PropertyMock
+        ) as mock_url:
+            mock_url.return_value = "http://example.com/repos?page=1"
+            client_obj = GithubOrgClient("google")
+            names = client_obj.iter_public_repos(prefetch=prefetch)
+            self.assertEqual(list(names), ["a", "b", "c"])
+            names = client_obj.iter_public_repos("mit", prefetch=prefetch)
+            self.assertEqual(list(names), ["a", "c"])
 
     @parameterized.expand([
         ({"license": {"key": "my_license"}}, "my_license", True),
@@ -70,21 +111,22 @@ class TestIntegrationGithubOrgClient(unittest.TestCase):
             cls.org_payload.get("repos_url"): cls.repos_payload,
         }
 
-        def mocked_get(url):
-            """Mock requests.get."""
+        def mocked_get(url, **kwargs):
+            """Mock requests.Session.get."""
             class MockResponse:
                 """Mock response class."""
 
                 def __init__(self, payload):
                     """Initialize mock response."""
                     self._payload = payload
+                    self.links = {}
 
                 def json(self):
                     """Return JSON payload."""
                     return self._payload
             return MockResponse(url_to_payload[url])
 
-        cls.get_patcher = patch("requests.get", side_effect=mocked_get)
+        cls.get_patcher = patch("requests.Session.get", side_effect=mocked_get)
         cls.get_patcher.start()
 
     @classmethod
@@ -102,3 +144,110 @@ class TestIntegrationGithubOrgClient(unittest.TestCase):
         client_obj = GithubOrgClient("google")
         result = client_obj.public_repos(license="apache-2.0")
         self.assertEqual(result, self.apache2_repos)
+
+
+class StubGithubHandler(BaseHTTPRequestHandler):
+    """Serve fixture payloads for /orgs/<org> and /orgs/<org>/repos."""
+
+    def do_GET(self):
+        """Return the org or repos payload for the requested path."""
+        parts = self.path.strip("/").split("/")
+        base = f"http://{self.server.server_address[0]}:{self.server.server_port}"
+        link = None
+        if len(parts) == 2 and parts[0] == "orgs":
+            payload = {"login": parts[1], "repos_url": f"{base}{self.path}/repos"}
+        elif len(parts) == 3 and parts[2] == "repos":
+            payload = repos_payload
+        elif len(parts) == 3 and parts[2].startswith("repos?page="):
+            page = int(parts[2].split("=")[1])
+            payload = [{"name": f"repo{page}"}]
+            if page < 3:
+                next_url = f"{base}/orgs/{parts[1]}/repos?page={page + 1}"
+                link = f'<{next_url}>; rel="next"'
+        else:
+            self.send_error(404)
+            return
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        if link:
+            self.send_header("Link", link)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Silence request logging."""
+
+
+class TestAsyncGithubOrgClient(unittest.TestCase):
+    """Test AsyncGithubOrgClient against a local stub server."""
+    @classmethod
+    def setUpClass(cls):
+        """Start the stub server."""
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubGithubHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        base = f"http://127.0.0.1:{cls.server.server_port}"
+        cls.url_patcher = patch.object(client, "ORG_URL", base + "/orgs/{org}")
+        cls.url_patcher.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop the stub server."""
+        cls.url_patcher.stop()
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_public_repos(self):
+        """Test public_repos fetches over HTTP."""
+        client_obj = AsyncGithubOrgClient("google")
+        self.assertEqual(asyncio.run(client_obj.public_repos()), expected_repos)
+        self.assertEqual(
+            asyncio.run(client_obj.public_repos(license="apache-2.0")),
+            apache2_repos,
+        )
+
+    def test_fetch_public_repos(self):
+        """Test many orgs are fetched concurrently."""
+        orgs = [f"org{i}" for i in range(20)]
+        result = asyncio.run(
+            AsyncGithubOrgClient.fetch_public_repos(orgs, concurrency=5)
+        )
+        self.assertEqual(result, {org: expected_repos for org in orgs})
+
+    def test_fetch_public_repos_isolates_failures(self):
+        """Test one failing org does not discard the others' results."""
+        original = AsyncGithubOrgClient.org
+
+        async def org(client_obj):
+            if client_obj._org_name == "broken":
+                return {"message": "Not Found"}
+            return await original(client_obj)
+
+        with patch.object(AsyncGithubOrgClient, "org", org):
+            result = asyncio.run(
+                AsyncGithubOrgClient.fetch_public_repos(["google", "broken"])
+            )
+        self.assertEqual(result["google"], expected_repos)
+        self.assertIsInstance(result["broken"], KeyError)
+
+    def test_sync_client(self):
+        """Test the sync client works over the shared session."""
+        client_obj = GithubOrgClient("google")
+        self.assertEqual(client_obj.public_repos(), expected_repos)
+
+    def test_link_pagination(self):
+        """Test both clients follow Link rel="next" headers."""
+        paged_url = f"http://127.0.0.1:{self.server.server_port}/orgs/paged/repos?page=1"
+        expected = ["repo1", "repo2", "repo3"]
+        with patch.object(
+                GithubOrgClient, "_public_repos_url", new_callable=PropertyMock
+        ) as mock_url:
+            mock_url.return_value = paged_url
+            client_obj = GithubOrgClient("paged")
+            self.assertEqual(client_obj.public_repos(), expected)
+            self.assertEqual(list(client_obj.iter_public_repos(prefetch=True)), expected)
+        async_client = AsyncGithubOrgClient("paged")
+        async_client._org = {"repos_url": paged_url}
+        self.assertEqual(asyncio.run(async_client.public_repos()), expected)
@@ -1,8 +1,17 @@
 #!/usr/bin/env python3
+import json
+import os
+import tempfile
+import threading
+import time
 import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from parameterized import parameterized
 from unittest.mock import patch, Mock
-from .utils import access_nested_map, get_json, memoize
+from .utils import (
+    access_nested_map, access_nested_maps, NestedPath, get_json, memoize, DEFAULT_TIMEOUT, ResponseCache,
+    SQLiteResponseCache, RateLimitedSession,
+)
 
 
 class TestAccessNestedMap(unittest.TestCase):
@@ -23,18 +32,59 @@ class TestAccessNestedMap(unittest.TestCase):
             access_nested_map(nested_map, path)
 
 
+class TestAccessNestedMaps(unittest.TestCase):
+    records = [
+        {"name": "a", "license": {"key": "mit"}},
+        {"name": "b", "license": None},
+        {"name": "c"},
+        {"name": "d", "license": {"key": "apache-2.0", "spdx": {"id": "A"}}},
+    ]
+
+    def test_rows_with_default(self):
+        result = access_nested_maps(
+            self.records, [("name",), ("license", "key")], default=None
+        )
+        self.assertEqual(result, [
+            ("a", "mit"), ("b", None), ("c", None), ("d", "apache-2.0"),
+        ])
+
+    def test_columnar(self):
+        result = access_nested_maps(
+            self.records, [("name",), ("license", "spdx", "id")],
+            default="", columnar=True,
+        )
+        self.assertEqual(result, [["a", "b", "c", "d"], ["", "", "", "A"]])
+
+    def test_missing_without_default_raises(self):
+        with self.assertRaises(KeyError):
+            access_nested_maps(self.records, [("license", "key")])
+
+    @parameterized.expand([
+        (("a",),),
+        (("a", "b"),),
+        (("a", "b", "c"),),
+        (("a", "b", "c", "d"),),
+    ])
+    def test_compiled_path_matches_access_nested_map(self, path):
+        nested_map = {"a": {"b": {"c": {"d": 1}}}}
+        self.assertEqual(
+            NestedPath(path)(nested_map), access_nested_map(nested_map, path)
+        )
+        self.assertEqual(NestedPath(path + ("x",), default=0)(nested_map), 0)
+
+
 class TestGetJson(unittest.TestCase):
     @parameterized.expand([
         ("http://example.com", {"payload": True}),
         ("http://holberton.io", {"payload": False}),
     ])
     def test_get_json(self, test_url, test_payload):
-        with patch("requests.get") as mock_get:
+        with patch("requests.Session.get") as mock_get:
             mock_resp = Mock()
             mock_resp.json.return_value = test_payload
             mock_get.return_value = mock_resp
             self.assertEqual(get_json(test_url), test_payload)
-            mock_get.assert_called_once_with(test_url)
+            mock_get.assert_called_once_with(test_url, timeout=DEFAULT_TIMEOUT)
 
 
 class TestMemoize(unittest.TestCase):
@@ -52,3 +102,308 @@ class TestMemoize(unittest.TestCase):
             self.assertEqual(obj.a_property, 42)
             self.assertEqual(obj.a_property, 42)
             mock_method.assert_called_once()
+
+    def test_memoize_single_call_across_threads(self):
+        calls = []
+
+        class TestClass:
+            @memoize
+            def a_property(self):
+                calls.append(1)
+                time.sleep(0.05)
+                return 42
+
+        obj = TestClass()
+        threads = [
+            threading.Thread(target=lambda: obj.a_property) for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+
+    def test_memoize_ttl(self):
+        class TestClass:
+            def a_method(self):
+                return 42
+
+            @memoize(ttl=60)
+            def a_property(self):
+                return self.a_method()
+
+        obj = TestClass()
+        with patch.object(TestClass, "a_method", return_value=42) as mock_method, \
+                patch("time.monotonic") as mock_clock:
+            mock_clock.return_value = 0
+            self.assertEqual(obj.a_property, 42)
+            self.assertEqual(obj.a_property, 42)
+            mock_clock.return_value = 61
+            self.assertEqual(obj.a_property, 42)
+            self.assertEqual(mock_method.call_count, 2)
+
+    def test_memoize_ttl_readable_once_set(self):
+        reads = []
+
+        class TestClass:
+            def __setattr__(self, name, value):
+                super().__setattr__(name, value)
+                if name == "_a_property":
+                    # What an unlocked concurrent reader sees at this point.
+                    reads.append(self.a_property)
+
+            @memoize(ttl=60)
+            def a_property(self):
+                return 42
+
+        self.assertEqual(TestClass().a_property, 42)
+        self.assertEqual(reads, [42])
+
+
+def make_response(payload, status_code=200, etag=None):
+    response = Mock()
+    response.status_code = status_code
+    response.json.return_value = payload
+    response.links = {}
+    response.headers = {"ETag": etag} if etag else {}
+    return response
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.session = Mock()
+        self.cache = ResponseCache(maxsize=2, ttl=10, clock=lambda: self.now)
+
+    def test_hit_and_miss(self):
+        self.session.get.return_value = make_response({"a": 1})
+        self.assertEqual(self.cache.get_json("http://x/a", self.session), {"a": 1})
+        self.assertEqual(self.cache.get_json("http://x/a", self.session), {"a": 1})
+        self.session.get.assert_called_once()
+        self.assertEqual(self.cache.stats["hits"], 1)
+        self.assertEqual(self.cache.stats["misses"], 1)
+
+    def test_ttl_expiry(self):
+        self.session.get.return_value = make_response({"a": 1})
+        self.cache.get_json("http://x/a", self.session)
+        self.now = 11
+        self.cache.get_json("http://x/a", self.session)
+        self.assertEqual(self.session.get.call_count, 2)
+
+    def test_per_key_ttl(self):
+        self.session.get.return_value = make_response({"a": 1})
+        self.cache.get_json("http://x/a", self.session, ttl=100)
+        self.now = 50
+        self.cache.get_json("http://x/a", self.session)
+        self.session.get.assert_called_once()
+
+    def test_lru_eviction(self):
+        self.session.get.side_effect = lambda url, **kwargs: make_response(url)
+        self.cache.get_json("http://x/a", self.session)
+        self.cache.get_json("http://x/b", self.session)
+        self.cache.get_json("http://x/a", self.session)
+        self.cache.get_json("http://x/c", self.session)
+        self.assertEqual(self.cache.stats["evictions"], 1)
+        self.cache.get_json("http://x/a", self.session)
+        self.assertEqual(self.session.get.call_count, 3)
+        self.cache.get_json("http://x/b", self.session)
+        self.assertEqual(self.session.get.call_count, 4)
+
+    def test_etag_revalidation(self):
+        self.session.get.return_value = make_response({"a": 1}, etag='"v1"')
+        self.cache.get_json("http://x/a", self.session)
+        self.now = 11
+        self.session.get.return_value = make_response(None, status_code=304)
+        self.assertEqual(self.cache.get_json("http://x/a", self.session), {"a": 1})
+        _, kwargs = self.session.get.call_args
+        self.assertEqual(kwargs["headers"], {"If-None-Match": '"v1"'})
+        self.assertEqual(self.cache.stats["revalidations"], 1)
+
+    def test_error_not_cached(self):
+        limited = {"message": "API rate limit exceeded"}
+        self.session.get.return_value = make_response(limited, status_code=403)
+        self.assertEqual(self.cache.get_json("http://x/a", self.session), limited)
+        self.session.get.return_value = make_response({"a": 1})
+        self.assertEqual(self.cache.get_json("http://x/a", self.session), {"a": 1})
+        self.assertEqual(self.session.get.call_count, 2)
+
+    def test_single_flight(self):
+        release = threading.Event()
+
+        def slow_get(url, **kwargs):
+            release.wait(5)
+            return make_response({"a": 1})
+
+        self.session.get.side_effect = slow_get
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(
+                    self.cache.get_json("http://x/a", self.session)
+                )
+            )
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [{"a": 1}] * 5)
+        self.session.get.assert_called_once()
+        self.assertEqual(self.cache.stats["coalesced"], 4)
+
+
+class TestSQLiteResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "cache.sqlite3")
+        self.session = Mock()
+        self.session.get.side_effect = lambda url, **kwargs: make_response(
+            {"url": url, "padding": "x" * 100}, etag='"v1"'
+        )
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def make_cache(self, **kwargs):
+        cache = SQLiteResponseCache(self.path, clock=lambda: self.now, **kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_warm_restart(self):
+        self.make_cache(ttl=60).get_json("http://x/a", self.session)
+        restarted = self.make_cache(ttl=60)
+        self.assertEqual(
+            restarted.get_json("http://x/a", self.session)["url"], "http://x/a"
+        )
+        self.session.get.assert_called_once()
+        self.assertEqual(restarted.stats["hits"], 1)
+
+    def test_error_not_persisted(self):
+        self.session.get.side_effect = None
+        self.session.get.return_value = make_response({}, status_code=503)
+        self.make_cache(ttl=60).get_json("http://x/a", self.session)
+        self.make_cache(ttl=60).get_json("http://x/a", self.session)
+        self.assertEqual(self.session.get.call_count, 2)
+
+    def test_expired_entry_revalidated(self):
+        self.make_cache(ttl=60).get_json("http://x/a", self.session)
+        self.now += 61
+        self.session.get.side_effect = None
+        self.session.get.return_value = make_response(None, status_code=304)
+        restarted = self.make_cache(ttl=60)
+        self.assertEqual(
+            restarted.get_json("http://x/a", self.session)["url"], "http://x/a"
+        )
+        _, kwargs = self.session.get.call_args
+        self.assertEqual(kwargs["headers"], {"If-None-Match": '"v1"'})
+
+    def test_size_bounded_eviction(self):
+        cache = self.make_cache(max_bytes=300)
+        for name in ("a", "b", "c"):
+            cache.get_json(f"http://x/{name}", self.session)
+            self.now += 1
+        self.assertEqual(cache.stats["evictions"], 1)
+        cache.get_json("http://x/c", self.session)
+        self.assertEqual(self.session.get.call_count, 3)
+        cache.get_json("http://x/a", self.session)
+        self.assertEqual(self.session.get.call_count, 4)
+
+
+class ScriptedHandler(BaseHTTPRequestHandler):
+    script = []
+
+    def do_GET(self):
+        status, headers = self.script.pop(0) if self.script else (200, {})
+        body = json.dumps({"status": status}).encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestRateLimitedSession(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), ScriptedHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_port}/"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.now = 0.0
+        self.sleeps = []
+        ScriptedHandler.script = []
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def make_session(self, **kwargs):
+        session = RateLimitedSession(
+            clock=lambda: self.now, sleep=self.sleep, **kwargs
+        )
+        self.addCleanup(session.close)
+        return session
+
+    def test_retry_after(self):
+        ScriptedHandler.script = [(429, {"Retry-After": "3"})]
+        session = self.make_session()
+        self.assertEqual(get_json(self.url, session), {"status": 200})
+        self.assertEqual(self.sleeps, [3.0])
+        self.assertEqual(session.metrics["retries"], 1)
+
+    def test_backoff_on_server_error(self):
+        ScriptedHandler.script = [(503, {}), (503, {})]
+        session = self.make_session(backoff=1.0)
+        self.assertEqual(get_json(self.url, session), {"status": 200})
+        self.assertEqual(len(self.sleeps), 2)
+        self.assertLessEqual(self.sleeps[1], 2.0)
+
+    def test_gives_up_after_max_retries(self):
+        ScriptedHandler.script = [(503, {})] * 3
+        session = self.make_session(max_retries=2)
+        self.assertEqual(session.get(self.url).status_code, 503)
+
+    def test_rate_limit_reset_pauses_requests(self):
+        reset = int(time.time()) + 2
+        ScriptedHandler.script = [
+            (200, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(reset)}),
+        ]
+        session = self.make_session()
+        session.get(self.url)
+        session.get(self.url)
+        self.assertEqual(len(self.sleeps), 1)
+        self.assertGreater(self.sleeps[0], 0.5)
+
+    def test_exhausted_403_retried_after_reset(self):
+        reset = int(time.time()) + 2
+        ScriptedHandler.script = [
+            (403, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(reset)}),
+        ]
+        session = self.make_session()
+        self.assertEqual(session.get(self.url).status_code, 200)
+        self.assertEqual(session.metrics["retries"], 1)
+        self.assertGreater(sum(self.sleeps), 0.5)
+
+    def test_token_bucket(self):
+        session = self.make_session(rate=2, burst=1)
+        for _ in range(3):
+            session.get(self.url)
+        metrics = session.metrics
+        self.assertAlmostEqual(metrics["throttled_seconds"], 1.0)
+        self.assertEqual(metrics["responses"], 3)
+        self.assertEqual(metrics["queue_depth"], 0)
@@ -1,25 +1,580 @@
 #!/usr/bin/env python3
-from typing import Any, Mapping, Sequence
+import asyncio
+import email.utils
+import json
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
 import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_TIMEOUT = 10.0
+POOL_SIZE = 32
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
 
 
 def access_nested_map(nested_map: Mapping[str, Any], path: Sequence[str]) -> Any:
     current: Any = nested_map
     for key in path:
-        current = current[key]
+        try:
+            current = current[key]
+        except TypeError:
+            raise KeyError(key) from None
     return current
 
 
-def get_json(url: str) -> Any:
-    response = requests.get(url)
+_MISSING: Any = object()
+
+
+class NestedPath:
+    """
+    A path compiled once and applied to many mappings.
+
+    Missing keys (or non-mapping intermediate values) raise `KeyError`
+    unless a `default` is given.
+    """
+    __slots__ = ("path", "default", "_get")
+
+    def __init__(self, path: Sequence[str], default: Any = _MISSING) -> None:
+        self.path = tuple(path)
+        self.default = default
+        self._get = self._compile(self.path)
+
+    @staticmethod
+    def _compile(path: Tuple[str, ...]) -> Callable[[Any], Any]:
+        # Unrolled getters for the common short paths avoid per-key loop
+        # overhead; longer paths fall back to the generic walk.
+        if len(path) == 1:
+            a, = path
+            return lambda m: m[a]
+        if len(path) == 2:
+            a, b = path
+            return lambda m: m[a][b]
+        if len(path) == 3:
+            a, b, c = path
+            return lambda m: m[a][b][c]
+        return lambda m: access_nested_map(m, path)
+
+    def __call__(self, nested_map: Mapping[str, Any]) -> Any:
+        try:
+            return self._get(nested_map)
+        except (KeyError, TypeError, IndexError):
+            if self.default is _MISSING:
+                return access_nested_map(nested_map, self.path)
+            return self.default
+
+    def extract(self, records: Sequence[Mapping[str, Any]]) -> List[Any]:
+        get, default = self._get, self.default
+        if default is _MISSING:
+            try:
+                return [get(record) for record in records]
+            except (KeyError, TypeError, IndexError):
+                return [self(record) for record in records]
+        values = []
+        append = values.append
+        for record in records:
+            try:
+                append(get(record))
+            except (KeyError, TypeError, IndexError):
+                append(default)
+        return values
+
+
+def access_nested_maps(records: Sequence[Mapping[str, Any]],
+                       paths: Sequence[Sequence[str]],
+                       default: Any = _MISSING,
+                       columnar: bool = False,
+                       as_numpy: bool = False) -> Any:
+    """
+    Extract many paths from many mappings.
+
+    Returns one tuple per record, or with `columnar` a list per path. With
+    `as_numpy` each column is a NumPy array (NumPy must be installed).
+    """
+    records = records if isinstance(records, Sequence) else list(records)
+    accessors = [NestedPath(path, default) for path in paths]
+    columns = [accessor.extract(records) for accessor in accessors]
+    if as_numpy:
+        import numpy
+        return [numpy.asarray(column) for column in columns]
+    if columnar:
+        return columns
+    return list(zip(*columns)) if columns else [() for _ in records]
+
+
+def _mount_pool(session: requests.Session) -> requests.Session:
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """Return the shared session, whose connections are pooled per host."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _mount_pool(requests.Session())
+    return _session
+
+
+def set_session(session: Optional[requests.Session]) -> None:
+    """Replace the shared session, e.g. with a RateLimitedSession."""
+    global _session
+    with _session_lock:
+        _session = session
+
+
+class TokenBucket:
+    """Thread-safe token bucket that can also be paused until a deadline."""
+
+    def __init__(self, rate: float, capacity: float,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = max(0.0, now - self._updated)
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> float:
+        """Take a token and return 0, or return how long to wait first."""
+        with self._lock:
+            now = self._clock()
+            if now < self._paused_until:
+                return self._paused_until - now
+            self._refill(now)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def limit(self, remaining: int) -> None:
+        """Never hold more tokens than the server says remain."""
+        with self._lock:
+            self._refill(self._clock())
+            self._tokens = min(self._tokens, float(remaining))
+
+    def pause(self, seconds: float) -> None:
+        """Hand out no tokens for `seconds`."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+
+class RateLimitedSession(requests.Session):
+    """
+    Pooled session that schedules requests under an API rate limit.
+
+    Every request takes a token from a bucket shared by all threads (and
+    tasks, whose requests run in threads) using this session.
+    `X-RateLimit-Remaining`/`X-RateLimit-Reset` responses shrink or pause the
+    bucket, and 429/5xx responses are retried after `Retry-After` or a
+    jittered exponential backoff.
+    """
+    RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+    def __init__(self, rate: float = 10.0, burst: float = 10.0,
+                 max_retries: int = 5, backoff: float = 0.5,
+                 max_backoff: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep) -> None:
+        super().__init__()
+        _mount_pool(self)
+        self.bucket = TokenBucket(rate, burst, clock)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._clock = clock
+        self._sleep = sleep
+        self._started = clock()
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            "requests": 0, "responses": 0, "retries": 0,
+            "throttled_seconds": 0.0, "queue_depth": 0, "max_queue_depth": 0,
+        }
+
+    @property
+    def metrics(self) -> Dict[str, float]:
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        elapsed = self._clock() - self._started
+        metrics["throughput"] = metrics["responses"] / elapsed if elapsed > 0 else 0.0
+        return metrics
+
+    def _count(self, name: str, amount: float = 1) -> None:
+        with self._metrics_lock:
+            self._metrics[name] += amount
+
+    def _acquire(self) -> None:
+        with self._metrics_lock:
+            self._metrics["queue_depth"] += 1
+            self._metrics["max_queue_depth"] = max(
+                self._metrics["max_queue_depth"], self._metrics["queue_depth"]
+            )
+        try:
+            while True:
+                wait = self.bucket.try_acquire()
+                if wait <= 0:
+                    return
+                self._count("throttled_seconds", wait)
+                self._sleep(wait)
+        finally:
+            self._count("queue_depth", -1)
+
+    def _backoff_delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def _observe(self, response: requests.Response) -> Optional[float]:
+        """Apply rate-limit headers and return a server-requested delay."""
+        headers = response.headers
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+        if remaining is not None and remaining.isdigit():
+            self.bucket.limit(int(remaining))
+            if int(remaining) == 0 and reset is not None and reset.isdigit():
+                self.bucket.pause(max(0.0, int(reset) - time.time()))
+        retry_after = headers.get("Retry-After")
+        if retry_after is None:
+            return None
+        if retry_after.isdigit():
+            return float(retry_after)
+        try:
+            when = email.utils.parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, when.timestamp() - time.time())
+
+    def request(self, method, url, *args, **kwargs):
+        attempt = 0
+        while True:
+            self._acquire()
+            self._count("requests")
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff_delay(attempt)
+            else:
+                self._count("responses")
+                retry_after = self._observe(response)
+                rate_limited = (
+                    response.status_code == 403
+                    and response.headers.get("X-RateLimit-Remaining") == "0"
+                )
+                retryable = (
+                    response.status_code in self.RETRY_STATUSES or rate_limited
+                )
+                if not retryable or attempt >= self.max_retries:
+                    return response
+                if retry_after is not None:
+                    delay = retry_after
+                elif rate_limited:
+                    # The bucket is paused until the reset; wait there.
+                    delay = 0.0
+                else:
+                    delay = self._backoff_delay(attempt)
+                response.close()
+            attempt += 1
+            self._count("retries")
+            if delay > 0:
+                self._sleep(delay)
+
+
+def get_json(url: str, session: Optional[requests.Session] = None,
+             timeout: float = DEFAULT_TIMEOUT) -> Any:
+    response = (session or get_session()).get(url, timeout=timeout)
     return response.json()
 
 
-def memoize(method):
+def get_json_page(url: str, session: Optional[requests.Session] = None,
+                  timeout: float = DEFAULT_TIMEOUT) -> Tuple[Any, Optional[str]]:
+    """Fetch one page of JSON and the URL of the `rel="next"` page, if any."""
+    response = (session or get_session()).get(url, timeout=timeout)
+    next_url = response.links.get("next", {}).get("url")
+    return response.json(), next_url
+
+
+async def get_json_async(url: str, session: Optional[requests.Session] = None,
+                         timeout: float = DEFAULT_TIMEOUT) -> Any:
+    """Fetch JSON without blocking the event loop, reusing pooled connections."""
+    return await asyncio.to_thread(get_json, url, session, timeout)
+
+
+async def get_json_page_async(
+        url: str, session: Optional[requests.Session] = None,
+        timeout: float = DEFAULT_TIMEOUT) -> Tuple[Any, Optional[str]]:
+    return await asyncio.to_thread(get_json_page, url, session, timeout)
+
+
+class _Entry:
+    __slots__ = ("payload", "next_url", "etag", "expires_at")
+
+    def __init__(self, payload: Any, next_url: Optional[str],
+                 etag: Optional[str], expires_at: float) -> None:
+        self.payload = payload
+        self.next_url = next_url
+        self.etag = etag
+        self.expires_at = expires_at
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Optional[Tuple[Any, Optional[str]]] = None
+        self.error: Optional[BaseException] = None
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU cache of JSON responses keyed by URL.
+
+    Entries live for `ttl` seconds (overridable per call) and the least
+    recently used entry is evicted beyond `maxsize`. Concurrent misses for
+    one URL share a single request (counted as `coalesced`). Expired entries
+    with an ETag are revalidated with `If-None-Match`, so an unchanged
+    resource costs a 304. Only 2xx responses are stored.
+
+    Storage is in memory; subclasses override `_get_entry`, `_put_entry`
+    and `_clear` to keep entries elsewhere.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0, "misses": 0, "coalesced": 0,
+            "evictions": 0, "revalidations": 0,
+        }
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clear()
+
+    def get_json(self, url: str, session: Optional[requests.Session] = None,
+                 timeout: float = DEFAULT_TIMEOUT,
+                 ttl: Optional[float] = None) -> Any:
+        return self.get_json_page(url, session, timeout, ttl)[0]
+
+    def get_json_page(self, url: str, session: Optional[requests.Session] = None,
+                      timeout: float = DEFAULT_TIMEOUT,
+                      ttl: Optional[float] = None) -> Tuple[Any, Optional[str]]:
+        with self._lock:
+            entry = self._get_entry(url)
+            if entry is not None and entry.expires_at > self._clock():
+                self._stats["hits"] += 1
+                return entry.payload, entry.next_url
+            flight = self._flights.get(url)
+            leader = flight is None
+            if leader:
+                flight = self._flights[url] = _Flight()
+                self._stats["misses"] += 1
+            else:
+                self._stats["coalesced"] += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = self._fetch(url, entry, session, timeout, ttl)
+            return flight.result
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._flights[url]
+            flight.done.set()
+
+    def _fetch(self, url: str, stale: Optional[_Entry],
+               session: Optional[requests.Session], timeout: float,
+               ttl: Optional[float]) -> Tuple[Any, Optional[str]]:
+        headers = {}
+        if stale is not None and stale.etag:
+            headers["If-None-Match"] = stale.etag
+        response = (session or get_session()).get(
+            url, timeout=timeout, headers=headers
+        )
+        revalidated = response.status_code == 304 and stale is not None
+        if not revalidated and not 200 <= response.status_code < 300:
+            # Errors such as rate-limit payloads are passed through
+            # uncached, so the next call fetches again.
+            return (
+                response.json(),
+                response.links.get("next", {}).get("url"),
+            )
+        expires_at = self._clock() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if revalidated:
+                self._stats["revalidations"] += 1
+                entry = stale
+                entry.expires_at = expires_at
+            else:
+                entry = _Entry(
+                    response.json(),
+                    response.links.get("next", {}).get("url"),
+                    response.headers.get("ETag"),
+                    expires_at,
+                )
+            self._stats["evictions"] += self._put_entry(url, entry)
+        return entry.payload, entry.next_url
+
+    def _get_entry(self, url: str) -> Optional[_Entry]:
+        entry = self._entries.get(url)
+        if entry is not None:
+            self._entries.move_to_end(url)
+        return entry
+
+    def _put_entry(self, url: str, entry: _Entry) -> int:
+        """Store an entry and return how many entries were evicted."""
+        self._entries[url] = entry
+        self._entries.move_to_end(url)
+        evicted = 0
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            evicted += 1
+        return evicted
+
+    def _clear(self) -> None:
+        self._entries.clear()
+
+
+class SQLiteResponseCache(ResponseCache):
+    """
+    ResponseCache persisted in a SQLite file, shared across processes.
+
+    Entries survive restarts, so fresh entries cost no network I/O on a warm
+    start. The file is kept under `max_bytes` of response bodies by evicting
+    the least recently used entries. Expiry uses wall-clock time so it is
+    meaningful across processes.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 64 * 1024 * 1024,
+                 ttl: float = 3600.0,
+                 clock: Callable[[], float] = time.time) -> None:
+        super().__init__(maxsize=0, ttl=ttl, clock=clock)
+        self.path = path
+        self.max_bytes = max_bytes
+        self._db = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " url TEXT PRIMARY KEY, body TEXT NOT NULL, next_url TEXT,"
+            " etag TEXT, expires_at REAL NOT NULL, accessed_at REAL NOT NULL,"
+            " size INTEGER NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed_at"
+            " ON responses (accessed_at)"
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def _get_entry(self, url: str) -> Optional[_Entry]:
+        row = self._db.execute(
+            "SELECT body, next_url, etag, expires_at FROM responses"
+            " WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        self._db.execute(
+            "UPDATE responses SET accessed_at = ? WHERE url = ?",
+            (self._clock(), url),
+        )
+        body, next_url, etag, expires_at = row
+        return _Entry(json.loads(body), next_url, etag, expires_at)
+
+    def _put_entry(self, url: str, entry: _Entry) -> int:
+        body = json.dumps(entry.payload)
+        with self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses"
+                " (url, body, next_url, etag, expires_at, accessed_at, size)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, body, entry.next_url, entry.etag, entry.expires_at,
+                 self._clock(), len(body)),
+            )
+            evicted = 0
+            total, = self._db.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+            if total > self.max_bytes:
+                rows = self._db.execute(
+                    "SELECT url, size FROM responses WHERE url != ?"
+                    " ORDER BY accessed_at", (url,)
+                ).fetchall()
+                stale = []
+                for old_url, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    stale.append((old_url,))
+                    total -= size
+                self._db.executemany("DELETE FROM responses WHERE url = ?", stale)
+                evicted = len(stale)
+        return evicted
+
+    def _clear(self) -> None:
+        self._db.execute("DELETE FROM responses")
+
+
+def memoize(method=None, *, ttl: Optional[float] = None):
+    """
+    Cache a method's result on the instance and expose it as a property.
+
+    Concurrent first accesses compute the value once. With `ttl` the value
+    is recomputed once it is older than `ttl` seconds.
+    """
+    if method is None:
+        return lambda method: memoize(method, ttl=ttl)
     attr_name = f"_{method.__name__}"
+    expires_name = f"{attr_name}_expires_at"
+    lock_name = f"{attr_name}_lock"
 
-    def wrapper(self):
+    def fresh(self):
         if not hasattr(self, attr_name):
-            setattr(self, attr_name, method(self))
+            return False
+        return ttl is None or getattr(self, expires_name) > time.monotonic()
+
+    def wrapper(self):
+        if not fresh(self):
+            lock = self.__dict__.setdefault(lock_name, threading.Lock())
+            with lock:
+                if not fresh(self):
+                    value = method(self)
+                    # fresh() runs unlocked and reads the expiry as soon as
+                    # the value exists, so the expiry is set first.
+                    if ttl is not None:
+                        setattr(self, expires_name, time.monotonic() + ttl)
+                    setattr(self, attr_name, value)
         return getattr(self, attr_name)
     return property(wrapper)
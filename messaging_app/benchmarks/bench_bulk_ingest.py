@@ -0,0 +1,53 @@
+"""
+Compare bulk message ingest with one POST per message.
+
+Usage::
+
+    python -m benchmarks.bench_bulk_ingest [--messages 2000]
+"""
+import argparse
+import time
+
+from benchmarks.common import setup, create_user
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=2000)
+    args = parser.parse_args()
+
+    setup()
+    from rest_framework.test import APIClient
+    from chats.models import Conversation, Message
+
+    user = create_user('bench@example.com')
+    conversation = Conversation.objects.create()
+    conversation.participants.add(user)
+    client = APIClient()
+    client.force_authenticate(user=user)
+    items = [
+        {
+            'conversation': str(conversation.conversation_id),
+            'message_body': f'Message {i}'
+        }
+        for i in range(args.messages)
+    ]
+
+    start = time.perf_counter()
+    for item in items:
+        client.post('/api/messages/', item, format='json')
+    single = time.perf_counter() - start
+    assert Message.objects.count() == args.messages
+
+    start = time.perf_counter()
+    client.post('/api/messages/bulk/', items, format='json')
+    bulk = time.perf_counter() - start
+    assert Message.objects.count() == 2 * args.messages
+
+    print(f'Message ingest ({args.messages} messages)')
+    print(f"  {'single POST':<20} {args.messages / single:>12.0f} messages/sec")
+    print(f"  {'bulk endpoint':<20} {args.messages / bulk:>12.0f} messages/sec")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Drive the messaging API in-process against seeded data.
+
+Seeds a throwaway database with ``seed_data``, then requests the
+conversation and message endpoints as a sample of users (weighted towards
+the busiest, as real traffic is) and reports p50/p95/p99 latency and
+queries per request. Run it before and after a change to ``views.py`` or
+``serializers.py`` to compare.
+
+Usage::
+
+    python -m benchmarks.bench_load [--messages 100000] [--requests 200]
+"""
+import argparse
+import random
+import re
+import statistics
+import time
+from io import StringIO
+
+from benchmarks.common import setup, percentiles
+
+QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--conversations', type=int, default=5000)
+    parser.add_argument('--messages', type=int, default=100000)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument(
+        '--cache',
+        action='store_true',
+        help='Keep the response cache on; by default every request misses.'
+    )
+    args = parser.parse_args()
+
+    setup()
+    from django.core.management import call_command
+    from django.test.utils import override_settings
+    from rest_framework.test import APIClient
+    from chats.models import Conversation, User
+
+    call_command(
+        'seed_data',
+        users=args.users,
+        conversations=args.conversations,
+        messages=args.messages,
+        verbosity=0,
+        stdout=StringIO()
+    )
+    rng = random.Random(0)
+    # Seeded users are numbered by popularity; busy users dominate traffic.
+    users = list(User.objects.filter(
+        email__startswith='seed', conversation_participants__isnull=False
+    ).distinct())
+    users.sort(key=lambda user: int(user.first_name[len('User'):]))
+    clients = {}
+    conversation_ids = {}
+
+    def client_for(user):
+        if user.pk not in clients:
+            client = APIClient()
+            client.force_authenticate(user=user)
+            clients[user.pk] = client
+        return clients[user.pk]
+
+    def pick_user():
+        return users[min(int(rng.expovariate(0.05)), len(users) - 1)]
+
+    def pick_conversation(user):
+        if user.pk not in conversation_ids:
+            conversation_ids[user.pk] = list(Conversation.objects.filter(
+                conversation_participants__participant=user
+            ).values_list('conversation_id', flat=True))
+        return rng.choice(conversation_ids[user.pk])
+
+    endpoints = {
+        'GET /api/conversations/': lambda user: '/api/conversations/',
+        'GET /api/conversations/{id}/': lambda user: (
+            f'/api/conversations/{pick_conversation(user)}/'
+        ),
+        'GET /api/conversations/{id}/messages/': lambda user: (
+            f'/api/conversations/{pick_conversation(user)}/messages/'
+        ),
+        'GET /api/messages/?conversation={id}': lambda user: (
+            f'/api/messages/?conversation={pick_conversation(user)}'
+        ),
+        'GET /api/messages/': lambda user: '/api/messages/',
+    }
+
+    cache_timeout = 300 if args.cache else 0
+    print(f'Load test ({args.messages} messages, {args.requests} requests '
+          f'per endpoint, cache {"on" if args.cache else "off"})')
+    print(f"  {'endpoint':<40} {'p50':>9} {'p95':>9} {'p99':>9} {'queries':>8}")
+    with override_settings(CHATS_RESPONSE_CACHE_TIMEOUT=cache_timeout):
+        for name, build_url in endpoints.items():
+            latencies = []
+            queries = []
+            for _ in range(args.requests):
+                user = pick_user()
+                url = build_url(user)
+                client = client_for(user)
+                start = time.perf_counter()
+                response = client.get(url)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                latencies.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 200, (url, response.status_code)
+                queries.append(int(
+                    QUERIES.search(response['Server-Timing']).group(1)
+                ))
+            p50, p95, p99 = percentiles(latencies)
+            print(f'  {name:<40} {p50:>7.2f}ms {p95:>7.2f}ms {p99:>7.2f}ms '
+                  f'{statistics.mean(queries):>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Compare ``MessageSerializer`` with the read-optimized
+``MessageValuesSerializer`` at several page sizes.
+
+Each timing covers fetching the rows, serializing and rendering JSON.
+
+Usage::
+
+    python -m benchmarks.bench_message_serialization [--sizes 10 100 1000]
+"""
+import argparse
+
+from benchmarks.common import setup, create_user, timed, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--senders', type=int, default=5)
+    args = parser.parse_args()
+
+    setup()
+    from rest_framework.renderers import JSONRenderer
+    from chats.models import Conversation, Message
+    from chats.serializers import MessageSerializer, MessageValuesSerializer
+
+    senders = [
+        create_user(f'sender{i}@example.com') for i in range(args.senders)
+    ]
+    conversation = Conversation.objects.create()
+    conversation.participants.add(*senders)
+    Message.objects.bulk_create(
+        (
+            Message(
+                sender=senders[i % len(senders)],
+                conversation=conversation,
+                message_body=f'Message {i}'
+            )
+            for i in range(max(args.sizes))
+        ),
+        batch_size=1000
+    )
+    ordered = Message.objects.order_by('-sent_at', '-message_id')
+    renderer = JSONRenderer()
+
+    def model_path(size):
+        page = ordered.select_related('sender')[:size]
+        return renderer.render(MessageSerializer(page, many=True).data)
+
+    def values_path(size):
+        page = ordered.values(*MessageValuesSerializer.values_fields)[:size]
+        return renderer.render(MessageValuesSerializer(page, many=True).data)
+
+    rows = []
+    for size in args.sizes:
+        rows.append((f'MessageSerializer, {size} rows', timed(
+            lambda: model_path(size)
+        )))
+        rows.append((f'MessageValuesSerializer, {size} rows', timed(
+            lambda: values_path(size)
+        )))
+    report('Message serialization', rows)
+
+
+if __name__ == '__main__':
+    main()
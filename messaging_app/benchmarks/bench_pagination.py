@@ -0,0 +1,85 @@
+"""
+Compare keyset pagination with OFFSET pagination over message history.
+
+Usage::
+
+    python -m benchmarks.bench_pagination [--messages 100000]
+"""
+import argparse
+from datetime import timedelta
+
+from benchmarks.common import setup, create_user, timed, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=100000)
+    parser.add_argument('--page-size', type=int, default=10)
+    args = parser.parse_args()
+
+    setup()
+    from django.utils import timezone
+    from rest_framework.pagination import Cursor
+    from rest_framework.test import APIClient
+    from chats.models import Conversation, Message
+    from chats.pagination import MessageCursorPagination
+
+    user = create_user('bench@example.com')
+    conversation = Conversation.objects.create()
+    conversation.participants.add(user)
+    start = timezone.now()
+    Message.objects.bulk_create(
+        (
+            Message(
+                sender=user,
+                conversation=conversation,
+                message_body=f'Message {i}',
+                sent_at=start - timedelta(seconds=i)
+            )
+            for i in range(args.messages)
+        ),
+        batch_size=5000
+    )
+
+    client = APIClient()
+    client.force_authenticate(user=user)
+    url = '/api/messages/'
+    params = {
+        'conversation': str(conversation.conversation_id),
+        'page_size': args.page_size
+    }
+    deep_page = args.messages // args.page_size
+    # The cursor position is the last message of the preceding page.
+    deep_message = Message.objects.order_by('-sent_at', '-message_id')[
+        (deep_page - 1) * args.page_size - 1
+    ]
+    paginator = MessageCursorPagination()
+    paginator.base_url = url
+    deep_cursor = paginator.encode_cursor(Cursor(
+        offset=0,
+        reverse=False,
+        position=str(deep_message.sent_at)
+    )).split('cursor=')[1]
+
+    def offset_page(number):
+        queryset = Message.objects.filter(conversation=conversation)
+        queryset.count()
+        offset = (number - 1) * args.page_size
+        list(queryset[offset:offset + args.page_size])
+
+    report(f'Message pagination ({args.messages} messages)', [
+        ('keyset, page 1', timed(lambda: client.get(url, params))),
+        (f'keyset, page {deep_page}', timed(
+            lambda: client.get(url, {**params, 'cursor': deep_cursor})
+        )),
+        ('offset + count, page 1 (queries only)', timed(
+            lambda: offset_page(1)
+        )),
+        (f'offset + count, page {deep_page} (queries only)', timed(
+            lambda: offset_page(deep_page)
+        )),
+    ])
+
+
+if __name__ == '__main__':
+    main()
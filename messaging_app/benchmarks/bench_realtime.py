@@ -0,0 +1,103 @@
+"""
+Load test websocket fanout on a single worker.
+
+Opens many websocket connections to the ASGI message stream in-process,
+publishes messages to a conversation they all belong to, and reports the
+latency from publish to delivery on each connection.
+
+Usage::
+
+    python -m benchmarks.bench_realtime [--connections 1000] [--messages 20]
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from benchmarks.common import setup, create_user
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--connections', type=int, default=1000)
+    parser.add_argument('--messages', type=int, default=20)
+    args = parser.parse_args()
+
+    setup()
+    from django.conf import settings
+    from django.test import Client
+    from chats.models import Conversation
+    from chats.realtime import WEBSOCKET_PATH, get_broker, websocket_application
+
+    conversation = Conversation.objects.create()
+    scopes = []
+    for i in range(args.connections):
+        user = create_user(f'bench{i}@example.com')
+        conversation.participants.add(user)
+        # A fresh client per user; logging in again would flush the session.
+        client = Client()
+        client.force_login(user)
+        cookie = client.cookies[settings.SESSION_COOKIE_NAME]
+        scopes.append({
+            'type': 'websocket',
+            'path': WEBSOCKET_PATH,
+            'headers': [(b'cookie', f'{cookie.key}={cookie.value}'.encode())],
+        })
+
+    latencies = []
+
+    async def run():
+        inboxes = []
+        accepted = asyncio.Semaphore(0)
+        delivered = asyncio.Semaphore(0)
+
+        async def send(event):
+            if event['type'] == 'websocket.accept':
+                accepted.release()
+            elif event['type'] == 'websocket.send':
+                sent_at = json.loads(event['text'])['published_at']
+                latencies.append(time.perf_counter() - sent_at)
+                delivered.release()
+
+        tasks = []
+        start = time.perf_counter()
+        for scope in scopes:
+            inbox = asyncio.Queue()
+            inbox.put_nowait({'type': 'websocket.connect'})
+            inboxes.append(inbox)
+            tasks.append(asyncio.ensure_future(
+                websocket_application(scope, inbox.get, send)
+            ))
+        for _ in scopes:
+            await accepted.acquire()
+        connect_time = time.perf_counter() - start
+
+        broker = get_broker()
+        channel = str(conversation.conversation_id)
+        start = time.perf_counter()
+        for _ in range(args.messages):
+            broker.publish(
+                channel, json.dumps({'published_at': time.perf_counter()})
+            )
+            for _ in scopes:
+                await delivered.acquire()
+        fanout_time = time.perf_counter() - start
+
+        for inbox in inboxes:
+            inbox.put_nowait({'type': 'websocket.disconnect'})
+        await asyncio.gather(*tasks)
+        return connect_time, fanout_time
+
+    connect_time, fanout_time = asyncio.run(run())
+    deliveries = args.connections * args.messages
+    latencies.sort()
+    print(f'Websocket fanout ({args.connections} connections, {args.messages} messages)')
+    print(f"  {'connect all':<24} {connect_time * 1000:>10.1f} ms")
+    print(f"  {'deliveries/sec':<24} {deliveries / fanout_time:>10.0f}")
+    print(f"  {'latency p50':<24} {statistics.median(latencies) * 1000:>10.3f} ms")
+    print(f"  {'latency p99':<24} {latencies[int(len(latencies) * 0.99) - 1] * 1000:>10.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Compare DRF's ``JSONRenderer`` with ``ChatsJSONRenderer`` on real
+``MessageSerializer`` payloads.
+
+Usage::
+
+    python -m benchmarks.bench_renderer [--sizes 100 1000 5000]
+"""
+import argparse
+from io import BytesIO
+
+from benchmarks.common import setup, create_user, timed, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 5000])
+    args = parser.parse_args()
+
+    setup()
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+    from chats.models import Conversation, Message
+    from chats.parsers import ChatsJSONParser, orjson
+    from chats.renderers import ChatsJSONRenderer
+    from chats.serializers import MessageSerializer
+
+    user = create_user('bench@example.com')
+    conversation = Conversation.objects.create()
+    conversation.participants.add(user)
+    Message.objects.bulk_create(
+        (
+            Message(
+                sender=user,
+                conversation=conversation,
+                message_body=f'Message {i} with a few more words in it'
+            )
+            for i in range(max(args.sizes))
+        ),
+        batch_size=1000
+    )
+    messages = list(Message.objects.select_related('sender'))
+    drf, fast = JSONRenderer(), ChatsJSONRenderer()
+
+    rows = []
+    for size in args.sizes:
+        payload = {
+            'next': None,
+            'previous': None,
+            'results': MessageSerializer(messages[:size], many=True).data
+        }
+        body = drf.render(payload)
+        assert fast.render(payload) == body
+        rows.extend([
+            (f'JSONRenderer, {size} messages', timed(
+                lambda: drf.render(payload)
+            )),
+            (f'ChatsJSONRenderer, {size} messages', timed(
+                lambda: fast.render(payload)
+            )),
+            (f'ChatsJSONRenderer streamed, {size} messages', timed(
+                lambda: b''.join(fast.iter_render(payload))
+            )),
+            (f'JSONParser, {size} messages', timed(
+                lambda: JSONParser().parse(BytesIO(body))
+            )),
+            (f'ChatsJSONParser, {size} messages', timed(
+                lambda: ChatsJSONParser().parse(BytesIO(body))
+            )),
+        ])
+    encoder = 'orjson' if orjson is not None else 'stdlib json'
+    report(f'JSON rendering ({encoder})', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Compare full-text message search with ``icontains`` scans.
+
+Usage::
+
+    python -m benchmarks.bench_search [--messages 1000000]
+"""
+import argparse
+import random
+
+from benchmarks.common import setup, create_user, timed, report
+
+WORDS = (
+    'lunch meeting friday deploy review coffee budget launch design '
+    'ticket release train invoice travel hotel flight weekend report '
+    'dinner standup retro sprint roadmap hiring offer contract'
+).split()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=1000000)
+    parser.add_argument('--conversations', type=int, default=1000)
+    args = parser.parse_args()
+
+    setup()
+    from chats.models import Conversation, Message
+    from chats.search import search_messages
+
+    user = create_user('bench@example.com')
+    conversations = Conversation.objects.bulk_create(
+        Conversation() for _ in range(args.conversations)
+    )
+    conversations[0].participants.add(user)
+    rng = random.Random(0)
+    Message.objects.bulk_create(
+        (
+            Message(
+                sender=user,
+                conversation=rng.choice(conversations),
+                message_body=' '.join(rng.choices(WORDS, k=12))
+            )
+            for _ in range(args.messages)
+        ),
+        batch_size=10000
+    )
+    # A rare term so the result set is small, as in typical searches.
+    Message.objects.create(
+        sender=user,
+        conversation=conversations[0],
+        message_body='quarterly zeppelin maintenance'
+    )
+
+    scoped = Message.objects.filter(conversation=conversations[0])
+    report(f'Message search ({args.messages} messages)', [
+        ('icontains, rare term', timed(
+            lambda: list(Message.objects.filter(message_body__icontains='zeppelin')[:20]),
+            repeat=5
+        )),
+        ('full-text, rare term', timed(
+            lambda: list(search_messages(Message.objects.all(), ['zeppelin'], ranked=True)[:20]),
+            repeat=5
+        )),
+        ('icontains, common term, one conversation', timed(
+            lambda: list(scoped.filter(message_body__icontains='lunch')[:20]),
+            repeat=5
+        )),
+        ('full-text, common term, one conversation', timed(
+            lambda: list(search_messages(scoped, ['lunch'], ranked=True)[:20]),
+            repeat=5
+        )),
+        # Most messages match, so every matching row needs a rank.
+        ('full-text, common term, unranked', timed(
+            lambda: list(search_messages(Message.objects.all(), ['lunch'])[:20]),
+            repeat=5
+        )),
+        ('full-text, common term, ranked', timed(
+            lambda: list(search_messages(Message.objects.all(), ['lunch'], ranked=True)[:20]),
+            repeat=5
+        )),
+    ])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Compare serializing a page of messages with nested ``UserSerializer``
+senders against the cached user summaries.
+
+Usage::
+
+    python -m benchmarks.bench_user_summary [--page-size 100] [--senders 5]
+"""
+import argparse
+
+from benchmarks.common import setup, create_user, timed, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--senders', type=int, default=5)
+    args = parser.parse_args()
+
+    setup()
+    from rest_framework.renderers import JSONRenderer
+    from chats.models import Conversation, Message
+    from chats.serializers import MessageSerializer, UserSerializer
+
+    class NestedMessageSerializer(MessageSerializer):
+        """The previous representation, with the full user nested."""
+        sender = UserSerializer(read_only=True)
+
+    senders = [
+        create_user(f'sender{i}@example.com') for i in range(args.senders)
+    ]
+    conversation = Conversation.objects.create()
+    conversation.participants.add(*senders)
+    Message.objects.bulk_create(
+        Message(
+            sender=senders[i % len(senders)],
+            conversation=conversation,
+            message_body=f'Message {i}'
+        )
+        for i in range(args.page_size)
+    )
+    page = list(Message.objects.select_related('sender'))
+    renderer = JSONRenderer()
+
+    def render(serializer_class):
+        return renderer.render(serializer_class(page, many=True).data)
+
+    report(f'Message page serialization ({args.page_size} messages, '
+           f'{args.senders} senders)', [
+        ('nested UserSerializer', timed(
+            lambda: render(NestedMessageSerializer)
+        )),
+        ('user summary', timed(lambda: render(MessageSerializer))),
+    ])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Shared helpers for the messaging app benchmarks.
+
+Benchmarks run against a throwaway test database so they never touch
+``db.sqlite3``. Run them from the ``messaging_app`` directory, e.g.::
+
+    python -m benchmarks.bench_pagination
+"""
+import os
+import statistics
+import time
+
+
+def setup():
+    """Configure Django and create a throwaway test database."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'messaging_app.settings')
+    import django
+    django.setup()
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+
+def create_user(email, **kwargs):
+    """Create a user for benchmark data without password hashing."""
+    from chats.models import User
+    return User.objects.create(
+        username=email,
+        email=email,
+        first_name=kwargs.pop('first_name', 'Bench'),
+        last_name=kwargs.pop('last_name', 'User'),
+        **kwargs
+    )
+
+
+def timed(func, repeat=20):
+    """Return the median wall time in milliseconds of ``func()``."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def percentiles(samples, points=(50, 95, 99)):
+    """Return the given percentiles of ``samples``."""
+    cuts = statistics.quantiles(samples, n=100, method='inclusive')
+    return [cuts[point - 1] for point in points]
+
+
+def report(title, rows):
+    """Print benchmark rows as ``label: value`` lines."""
+    print(title)
+    for label, value in rows:
+        print(f"  {label:<40} {value:>10.3f} ms")
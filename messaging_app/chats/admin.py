@@ -1,7 +1,7 @@
 from django.contrib import admin
-from .models import User, Conversation, Message
+from .models import User, Conversation, Message, ArchivedMessage
 
 admin.site.register(User)
 admin.site.register(Conversation)
 admin.site.register(Message)
-
+admin.site.register(ArchivedMessage)
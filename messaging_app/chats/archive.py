@@ -0,0 +1,74 @@
+"""
+Hot/cold storage of messages.
+
+``archive_messages`` moves messages older than ``CHATS_ARCHIVE_AFTER_DAYS``
+from the ``message`` table to ``message_archive``, so the hot table and its
+``(conversation, -sent_at)`` index only hold recent messages. Every archived
+message is therefore older than the hot boundary, ``now`` minus that many
+days, and history reads wrapped by ``with_archive`` only query the archive
+when a page reaches past it.
+
+Full-text search covers the hot table only.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .sharding import ShardedQuerySet, sort_value
+
+
+def get_archive_after_days():
+    """Return ``CHATS_ARCHIVE_AFTER_DAYS``, ``None`` when archiving is off."""
+    return getattr(settings, 'CHATS_ARCHIVE_AFTER_DAYS', None)
+
+
+def get_hot_boundary():
+    """Return the time every archived message is older than, or ``None``."""
+    days = get_archive_after_days()
+    if days is None:
+        return None
+    return timezone.now() - timedelta(days=days)
+
+
+class TieredQuerySet(ShardedQuerySet):
+    """
+    Hot messages continued into the archive, read as one ordered result.
+
+    ``querysets`` holds the hot queryset then the archive one. A newest-first
+    page whose oldest hot row is at or after ``boundary`` cannot contain
+    archived rows, so it is read from the hot table alone.
+    """
+
+    def __init__(self, querysets, boundary):
+        super().__init__(querysets)
+        self.boundary = boundary
+
+    def derive(self, querysets):
+        return TieredQuerySet(querysets, self.boundary)
+
+    @property
+    def hot(self):
+        """Return the hot queryset."""
+        return self.querysets[0]
+
+    def merge(self, limit=None):
+        hot, archive = self.querysets
+        hot_rows = list(hot if limit is None else hot[:limit])
+        if (
+            limit is not None
+            and len(hot_rows) == limit
+            and self.get_ordering()[:1] == ['-sent_at']
+            and sort_value(hot_rows[-1], 'sent_at') >= self.boundary
+        ):
+            return hot_rows
+        archive_rows = list(archive if limit is None else archive[:limit])
+        return self.merge_rows([hot_rows, archive_rows], limit)
+
+
+def with_archive(hot, archive):
+    """Return ``hot`` continued into ``archive`` when archiving is on."""
+    boundary = get_hot_boundary()
+    if boundary is None:
+        return hot
+    return TieredQuerySet([hot, archive], boundary)
@@ -0,0 +1,104 @@
+"""
+Versioned response caching for the conversation endpoints.
+
+Every conversation and every user has a version number in Django's cache.
+Cached responses are keyed by the versions they depend on, so bumping a
+version invalidates them without deleting anything:
+
+* a conversation's version changes when its messages or participants do;
+* a user's version changes when any conversation they are in changes, which
+  invalidates their conversation list.
+
+Responses carry an ``ETag`` derived from the cache key, so polling clients
+sending ``If-None-Match`` get ``304 Not Modified`` while nothing changed.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import ConversationParticipant
+
+
+def version_key(kind, pk):
+    """Return the cache key holding a conversation or user version."""
+    return f'chats:{kind}:{pk}:version'
+
+
+def get_version(kind, pk):
+    """Return the current version for a conversation or user."""
+    key = version_key(kind, pk)
+    version = cache.get(key)
+    if version is None:
+        # Start from the clock so a version lost to eviction is never reused.
+        version = time.time_ns()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_versions(keys):
+    """Increment each version key, starting any missing ones afresh."""
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+def conversation_version_keys(conversation_ids, user_ids=()):
+    """Return version keys for conversations, their participants and users."""
+    conversation_ids = set(conversation_ids)
+    participant_ids = ConversationParticipant.objects.filter(
+        conversation_id__in=conversation_ids
+    ).values_list('participant_id', flat=True)
+    return [
+        *(version_key('conversation', pk) for pk in conversation_ids),
+        *(version_key('user', pk) for pk in {*participant_ids, *user_ids}),
+    ]
+
+
+def invalidate_conversations(conversation_ids, user_ids=()):
+    """
+    Invalidate cached responses for conversations and their participants.
+
+    Versions are bumped immediately, so later reads in this transaction miss
+    the cache, and again on commit, so a response a concurrent request
+    cached from pre-commit data is not served afterwards.
+    """
+    keys = conversation_version_keys(conversation_ids, user_ids)
+    bump_versions(keys)
+    transaction.on_commit(lambda: bump_versions(keys))
+
+
+def cached_response(request, key_parts, build):
+    """
+    Return a cached response for ``key_parts``, building it on a miss.
+
+    Only successful responses are cached. Caching is disabled when
+    ``CHATS_RESPONSE_CACHE_TIMEOUT`` is 0 or None.
+    """
+    timeout = getattr(settings, 'CHATS_RESPONSE_CACHE_TIMEOUT', 300)
+    if not timeout:
+        return build()
+    key = 'chats:response:' + ':'.join(str(part) for part in key_parts)
+    etag = '"{}"'.format(hashlib.md5(key.encode()).hexdigest())
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    data = cache.get(key)
+    if data is None:
+        response = build()
+        if response.status_code != status.HTTP_200_OK:
+            return response
+        cache.set(key, response.data, timeout)
+    else:
+        response = Response(data)
+    for name, value in headers.items():
+        response[name] = value
+    return response
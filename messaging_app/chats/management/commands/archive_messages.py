@@ -0,0 +1,119 @@
+"""
+Move old messages from the hot message table to the archive.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from chats.archive import get_archive_after_days
+from chats.models import ArchivedMessage, Conversation, Message
+from chats.sharding import delete_rows, get_shards
+
+
+class Command(BaseCommand):
+    help = (
+        'Move messages older than CHATS_ARCHIVE_AFTER_DAYS to the archive '
+        'table in batches. Each conversation\'s last message stays hot.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Archive messages older than this; at least '
+                 'CHATS_ARCHIVE_AFTER_DAYS, which is the default.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of messages moved per transaction.'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Count the messages to archive without moving them.'
+        )
+
+    def handle(self, *args, **options):
+        after_days = get_archive_after_days()
+        if after_days is None:
+            raise CommandError(
+                'Set CHATS_ARCHIVE_AFTER_DAYS so history reads include '
+                'archived messages.'
+            )
+        days = after_days if options['days'] is None else options['days']
+        # Reads only look in the archive past the CHATS_ARCHIVE_AFTER_DAYS
+        # boundary, so newer messages must stay hot.
+        if days < after_days:
+            raise CommandError(
+                f'--days must be at least CHATS_ARCHIVE_AFTER_DAYS ({after_days}).'
+            )
+        cutoff = timezone.now() - timedelta(days=days)
+        archived = 0
+        for alias in get_shards() or [DEFAULT_DB_ALIAS]:
+            archived += self.archive(
+                alias, cutoff, options['batch_size'], options['dry_run']
+            )
+        verb = 'Would archive' if options['dry_run'] else 'Archived'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {archived} messages sent before {cutoff:%Y-%m-%d %H:%M}.'
+        ))
+
+    def archive(self, alias, cutoff, batch_size, dry_run):
+        """Archive ``alias``'s messages sent before ``cutoff``."""
+        archived = 0
+        last_id = None
+        while True:
+            # Keyset over the primary key, so each batch resumes where the
+            # previous one stopped instead of rescanning kept messages.
+            messages = Message.objects.using(alias).filter(
+                sent_at__lt=cutoff
+            ).order_by('message_id')
+            if last_id is not None:
+                messages = messages.filter(message_id__gt=last_id)
+            batch = list(messages[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].message_id
+            last_messages = set(Conversation.objects.filter(
+                last_message__in=[message.message_id for message in batch]
+            ).values_list('last_message_id', flat=True))
+            batch = [
+                message for message in batch
+                if message.message_id not in last_messages
+            ]
+            if not dry_run:
+                self.move(batch, alias)
+            archived += len(batch)
+            self.stdout.write(f'Archived {archived} messages on {alias}.')
+        return archived
+
+    @staticmethod
+    def move(messages, alias):
+        """
+        Copy ``messages`` to the archive and delete them, atomically.
+
+        The delete bypasses signals: the messages are not gone, and none of
+        them is a conversation's last message.
+        """
+        with transaction.atomic(using=alias):
+            ArchivedMessage.objects.using(alias).bulk_create(
+                [
+                    ArchivedMessage(
+                        message_id=message.message_id,
+                        sender_id=message.sender_id,
+                        conversation_id=message.conversation_id,
+                        message_body=message.message_body,
+                        sent_at=message.sent_at
+                    )
+                    for message in messages
+                ],
+                ignore_conflicts=True
+            )
+            delete_rows(
+                Message, [message.message_id for message in messages], alias
+            )
@@ -0,0 +1,65 @@
+"""
+Backfill Conversation.last_message and last_activity_at from messages.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from chats.models import Conversation, Message
+from chats.sharding import group_by_shard, is_sharded
+
+
+class Command(BaseCommand):
+    help = 'Backfill each conversation\'s last message and activity time.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of conversations updated per transaction.'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        updated = 0
+        last_id = None
+        while True:
+            conversations = Conversation.objects.order_by('conversation_id')
+            if last_id is not None:
+                conversations = conversations.filter(conversation_id__gt=last_id)
+            batch = list(conversations[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].conversation_id
+            current = {
+                conversation.conversation_id: conversation.last_message_id
+                for conversation in batch
+            }
+            # Conditional updates never overwrite a newer message written
+            # by a concurrent request while the backfill runs.
+            stale = [
+                message
+                for message in self.latest_messages(list(current))
+                if current[message.conversation_id] != message.message_id
+            ]
+            with transaction.atomic():
+                Message.objects.record_activity(stale)
+            updated += len(stale)
+            self.stdout.write(f'Processed {len(batch)} conversations, updated {updated}.')
+        self.stdout.write(self.style.SUCCESS(f'Backfilled {updated} conversations.'))
+
+    @staticmethod
+    def latest_messages(conversation_ids):
+        """Return the conversations' newest messages, read from each shard."""
+        if not is_sharded():
+            return Message.objects.latest_per_conversation().filter(
+                conversation__in=conversation_ids
+            )
+        messages = []
+        for shard, ids in group_by_shard(conversation_ids).items():
+            # Users are not on the shards, so the sender is not joined.
+            messages.extend(
+                Message.objects.using(shard).latest_per_conversation()
+                .select_related(None).filter(conversation_id__in=ids)
+            )
+        return messages
@@ -0,0 +1,105 @@
+"""
+Move messages, archived ones included, to the shard their conversation
+hashes to.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from chats.models import ArchivedMessage, Message
+from chats.sharding import delete_rows, get_shards, shard_for
+
+
+class Command(BaseCommand):
+    help = (
+        'Move messages, archived ones included, that are not on their '
+        'conversation\'s shard, after CHATS_MESSAGE_SHARDS changed or when '
+        'sharding is first enabled.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of messages read per query.'
+        )
+        parser.add_argument(
+            '--database',
+            action='append',
+            default=[],
+            help='Extra alias to drain, such as a shard being removed.'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Count the messages to move without moving them.'
+        )
+
+    def handle(self, *args, **options):
+        shards = get_shards()
+        if not shards:
+            raise CommandError('CHATS_MESSAGE_SHARDS is empty.')
+        sources = list(dict.fromkeys(
+            [*shards, DEFAULT_DB_ALIAS, *options['database']]
+        ))
+        for alias in sources:
+            if alias not in connections:
+                raise CommandError(f'Unknown database alias {alias!r}.')
+        moved = 0
+        # Archived messages live on their conversation's shard too.
+        for model in (Message, ArchivedMessage):
+            for source in sources:
+                moved += self.drain(
+                    model, source, shards,
+                    options['batch_size'], options['dry_run']
+                )
+        verb = 'Would move' if options['dry_run'] else 'Moved'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {moved} messages.'))
+
+    def drain(self, model, source, shards, batch_size, dry_run):
+        """Move ``source``'s misplaced ``model`` rows, returning how many."""
+        if model._meta.db_table not in connections[source].introspection.table_names():
+            return 0
+        moved = 0
+        last_id = None
+        while True:
+            messages = model.objects.using(source).order_by('message_id')
+            if last_id is not None:
+                messages = messages.filter(message_id__gt=last_id)
+            batch = list(messages[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].message_id
+            targets = {}
+            for message in batch:
+                target = shard_for(message.conversation_id, shards)
+                if target != source:
+                    targets.setdefault(target, []).append(message)
+            for target, group in targets.items():
+                if not dry_run:
+                    self.move(model, group, source, target)
+                moved += len(group)
+            self.stdout.write(
+                f'Scanned {model._meta.db_table} on {source}, '
+                f'{moved} messages to move.'
+            )
+        return moved
+
+    @staticmethod
+    def move(model, messages, source, target):
+        """
+        Copy ``messages`` to ``target``, then delete them from ``source``.
+
+        The copy ignores rows already present, so an interrupted run can be
+        repeated safely.
+        """
+        with transaction.atomic(using=target):
+            model.objects.using(target).bulk_create(
+                messages, ignore_conflicts=True
+            )
+        # No signals or SET_NULL on conversations: the messages still
+        # exist, only elsewhere.
+        with transaction.atomic(using=source):
+            delete_rows(
+                model, [message.message_id for message in messages], source
+            )
@@ -0,0 +1,21 @@
+"""
+Rebuild the message full-text search index.
+"""
+from django.core.management.base import BaseCommand
+
+from chats.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the message full-text search index.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            default='default',
+            help='Database alias to rebuild the index for.'
+        )
+
+    def handle(self, *args, **options):
+        rebuild_search_index(options['database'])
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt.'))
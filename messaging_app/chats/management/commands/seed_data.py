@@ -0,0 +1,242 @@
+"""
+Seed users, conversations and messages at a realistic scale.
+"""
+import bisect
+import itertools
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from chats.models import Conversation, ConversationParticipant, Message, User
+
+WORDS = (
+    'hey hi ok thanks sure lunch meeting friday deploy review coffee budget '
+    'launch design ticket release invoice travel hotel flight weekend report '
+    'dinner standup sprint roadmap hiring offer contract call later tomorrow '
+    'today tonight soon sounds good great yes no maybe please check link'
+).split()
+
+# Relative message volume per hour of the day, peaking in office hours.
+HOURLY_WEIGHTS = (
+    1, 1, 1, 1, 1, 2, 4, 8, 12, 14, 14, 13,
+    14, 14, 13, 12, 11, 10, 9, 8, 7, 5, 3, 2
+)
+
+
+def zipf_cum_weights(count, exponent):
+    """Return cumulative Zipf weights, so rank 1 is picked most often."""
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)
+    ))
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed users, conversations and messages with skewed, realistic '
+        'distributions using bulk inserts.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--conversations', type=int, default=5000)
+        parser.add_argument('--messages', type=int, default=100000)
+        parser.add_argument(
+            '--max-participants',
+            type=int,
+            default=50,
+            help='Largest group size; most conversations have two people.'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=90,
+            help='Messages are spread over this many days, newest first.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Number of rows per bulk insert.'
+        )
+        parser.add_argument(
+            '--prefix',
+            default='seed',
+            help='Prefix of seeded emails, so several runs can coexist.'
+        )
+        parser.add_argument(
+            '--password',
+            default='password',
+            help='Password shared by every seeded user.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['users'] < 2:
+            raise CommandError('At least 2 users are required.')
+        if options['days'] < 1:
+            raise CommandError('--days must be at least 1.')
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.days = options['days']
+        users = self.create_users(
+            options['users'], options['prefix'], options['password']
+        )
+        conversations = self.create_conversations(
+            options['conversations'], users, options['max_participants']
+        )
+        self.create_messages(options['messages'], conversations)
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(users)} users, {len(conversations)} conversations "
+            f"and {options['messages']} messages."
+        ))
+
+    def bulk_create(self, model, objects):
+        """Insert ``objects`` in batches, returning how many were inserted."""
+        inserted = 0
+        objects = iter(objects)
+        while True:
+            batch = list(itertools.islice(objects, self.batch_size))
+            if not batch:
+                return inserted
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+            inserted += len(batch)
+
+    def create_users(self, count, prefix, password):
+        """Create users sharing one password hash."""
+        password = make_password(password)
+        users = [
+            User(
+                username=f'{prefix}{i}@example.com',
+                email=f'{prefix}{i}@example.com',
+                first_name=f'User{i}',
+                last_name=prefix.capitalize(),
+                role=self.rng.choices(
+                    ('guest', 'host', 'admin'), (90, 9, 1)
+                )[0],
+                password=password,
+                created_at=self.now - timedelta(days=self.days + 30)
+            )
+            for i in range(count)
+        ]
+        self.bulk_create(User, users)
+        self.stdout.write(f'Created {count} users.')
+        return users
+
+    def participant_count(self, max_participants):
+        """Draw a heavy-tailed group size; most conversations are pairs."""
+        size = int(1 + self.rng.paretovariate(1.2))
+        return max(2, min(size, max_participants))
+
+    def create_conversations(self, count, users, max_participants):
+        """
+        Create conversations with skewed participant counts.
+
+        Users are picked by Zipf popularity, so a few users take part in
+        many conversations, as heavy users do.
+        """
+        max_participants = min(max_participants, len(users))
+        cum_weights = zipf_cum_weights(len(users), 1.0)
+        conversations = []
+        participants = {}
+        for _ in range(count):
+            conversation = Conversation(
+                created_at=self.now - timedelta(days=self.days),
+                last_activity_at=self.now - timedelta(days=self.days)
+            )
+            members = set()
+            size = self.participant_count(max_participants)
+            while len(members) < size:
+                members.add(self.rng.choices(
+                    users, cum_weights=cum_weights
+                )[0])
+            conversations.append(conversation)
+            participants[conversation.conversation_id] = list(members)
+        self.bulk_create(Conversation, conversations)
+        self.bulk_create(ConversationParticipant, (
+            ConversationParticipant(
+                conversation=conversation,
+                participant=user,
+                joined_at=conversation.created_at,
+                last_read_at=self.now - timedelta(
+                    hours=self.rng.expovariate(1 / 24)
+                )
+            )
+            for conversation in conversations
+            for user in participants[conversation.conversation_id]
+        ))
+        self.members = participants
+        self.stdout.write(f'Created {count} conversations.')
+        return conversations
+
+    def sent_at(self):
+        """
+        Draw a send time: recent days are busier and hours follow the
+        office-day curve in ``HOURLY_WEIGHTS``.
+        """
+        day = min(int(self.rng.expovariate(4 / self.days)), self.days - 1)
+        hour = self.rng.choices(range(24), HOURLY_WEIGHTS)[0]
+        value = (self.now - timedelta(days=day)).replace(
+            hour=hour,
+            minute=self.rng.randrange(60),
+            second=self.rng.randrange(60),
+            microsecond=self.rng.randrange(1000000)
+        )
+        # Today's later hours have not happened yet.
+        return value if value <= self.now else value - timedelta(days=1)
+
+    def create_messages(self, count, conversations):
+        """
+        Create messages, a few conversations receiving most of them.
+
+        Each conversation's last message is tracked while generating and
+        written with one bulk update at the end.
+        """
+        if not conversations:
+            return
+        cum_weights = zipf_cum_weights(len(conversations), 1.1)
+        latest = {}
+
+        def generate():
+            for _ in range(count):
+                conversation = conversations[bisect.bisect_left(
+                    cum_weights, self.rng.random() * cum_weights[-1]
+                )]
+                message = Message(
+                    sender=self.rng.choice(
+                        self.members[conversation.conversation_id]
+                    ),
+                    conversation=conversation,
+                    message_body=' '.join(self.rng.choices(
+                        WORDS, k=max(1, int(self.rng.lognormvariate(1.8, 0.6)))
+                    )),
+                    sent_at=self.sent_at()
+                )
+                current = latest.get(conversation.conversation_id)
+                if current is None or message.sent_at > current.sent_at:
+                    latest[conversation.conversation_id] = message
+                yield message
+
+        inserted = 0
+        messages = generate()
+        while inserted < count:
+            inserted += self.bulk_create(
+                Message, itertools.islice(messages, self.batch_size)
+            )
+            self.stdout.write(f'Created {inserted} of {count} messages.')
+        for conversation in conversations:
+            message = latest.get(conversation.conversation_id)
+            if message is not None:
+                conversation.last_message = message
+                conversation.last_activity_at = message.sent_at
+        with transaction.atomic():
+            Conversation.objects.bulk_update(
+                conversations,
+                ['last_message', 'last_activity_at'],
+                batch_size=self.batch_size
+            )
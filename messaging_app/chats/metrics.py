@@ -0,0 +1,171 @@
+"""
+Per-request performance metrics.
+
+``PerformanceMiddleware`` opens a ``RequestMetrics`` for every request and
+records SQL queries, database time, serializer time and render time into
+it. Finished requests are aggregated per view and action into the
+process-wide ``registry`` of histograms served by the metrics endpoint.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from rest_framework.serializers import BaseSerializer
+
+# Upper bounds of the histogram buckets, in milliseconds and in queries.
+DURATION_BUCKETS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+_current = contextvars.ContextVar('chats_request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Costs accumulated by a single request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.finished = None
+        self.queries = 0
+        self.durations = {'db': 0.0, 'serialize': 0.0, 'render': 0.0}
+        self._active = set()
+
+    def add(self, name, seconds):
+        """Add ``seconds`` to the ``name`` phase."""
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def finish(self):
+        """Stop the request clock."""
+        self.finished = time.perf_counter()
+
+    @property
+    def total(self):
+        """Return the seconds the request took, or has taken so far."""
+        return (self.finished or time.perf_counter()) - self.started
+
+    def record_query(self, execute, sql, params, many, context):
+        """Database execute wrapper counting and timing queries."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.add('db', time.perf_counter() - start)
+
+    @contextmanager
+    def activate(self):
+        """Make these the metrics of the current request."""
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+
+@contextmanager
+def phase(name):
+    """
+    Time the enclosed block as the ``name`` phase of the current request.
+
+    Nested blocks of the same phase are only counted once.
+    """
+    metrics = _current.get()
+    if metrics is None or name in metrics._active:
+        yield
+        return
+    metrics._active.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics._active.discard(name)
+        metrics.add(name, time.perf_counter() - start)
+
+
+def instrument_serializers():
+    """
+    Time serializer output as the ``serialize`` phase.
+
+    DRF has no hook around serialization, so ``BaseSerializer.data``,
+    which every serializer's ``data`` goes through, is wrapped once.
+    """
+    data = BaseSerializer.data
+    if getattr(data.fget, 'instrumented', False):
+        return
+
+    def timed_data(self):
+        with phase('serialize'):
+            return data.fget(self)
+
+    timed_data.instrumented = True
+    BaseSerializer.data = property(timed_data)
+
+
+class Histogram:
+    """Cumulative histogram over fixed bucket upper bounds."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        """Record one observation."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self):
+        """Return the histogram as Prometheus-style cumulative buckets."""
+        buckets = {}
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {'buckets': buckets, 'count': self.count, 'sum': self.sum}
+
+
+class MetricsRegistry:
+    """Histograms of request metrics keyed by view and action."""
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, key, metrics):
+        """Record a finished request under ``key``."""
+        values = {
+            'total_ms': metrics.total * 1000,
+            'queries': metrics.queries,
+        }
+        for name, seconds in metrics.durations.items():
+            values[f'{name}_ms'] = seconds * 1000
+        with self._lock:
+            histograms = self._histograms.setdefault(key, {})
+            for name, value in values.items():
+                if name not in histograms:
+                    histograms[name] = Histogram(
+                        QUERY_BUCKETS if name == 'queries' else DURATION_BUCKETS
+                    )
+                histograms[name].observe(value)
+
+    def snapshot(self):
+        """Return every histogram, keyed by view and metric name."""
+        with self._lock:
+            return {
+                key: {
+                    name: histogram.snapshot()
+                    for name, histogram in histograms.items()
+                }
+                for key, histograms in sorted(self._histograms.items())
+            }
+
+    def clear(self):
+        """Drop all recorded metrics."""
+        with self._lock:
+            self._histograms.clear()
+
+
+registry = MetricsRegistry()
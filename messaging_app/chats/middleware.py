@@ -0,0 +1,154 @@
+"""
+Middleware for the messaging app.
+"""
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import RequestMetrics, instrument_serializers, registry
+from .routers import get_replicas, replica_reads
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PIN_COOKIE = 'chats_pin_primary'
+
+logger = logging.getLogger('chats.performance')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a view runs more SQL queries than its budget."""
+
+
+def get_view_name(view_func, method):
+    """Return ``ViewSet.action`` for DRF views, else the view's path."""
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return f'{view_func.__module__}.{view_func.__qualname__}'
+    actions = getattr(view_func, 'actions', None) or {}
+    return f'{cls.__name__}.{actions.get(method.lower(), method.lower())}'
+
+
+class PerformanceMiddleware:
+    """
+    Record what each request costs.
+
+    SQL query count, database time, serializer time and render time are
+    sent back in a ``Server-Timing`` header, logged as one JSON line on the
+    ``chats.performance`` logger and aggregated per view and action in
+    ``chats.metrics.registry``. Streamed responses render after the
+    middleware returns, so their render time is not included.
+
+    ``CHATS_QUERY_BUDGETS`` maps view names (``ConversationViewSet.list``)
+    to the most queries they may run; a request over budget raises
+    ``QueryBudgetExceeded``. Tests set it to guard against N+1 regressions.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        instrument_serializers()
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        request.performance_metrics = metrics
+        with ExitStack() as stack:
+            stack.enter_context(metrics.activate())
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(metrics.record_query)
+                )
+            response = self.get_response(request)
+        metrics.finish()
+        view_name = getattr(request, 'performance_view', None)
+        response['Server-Timing'] = self.server_timing(metrics)
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': view_name,
+            'status': response.status_code,
+            'queries': metrics.queries,
+            'total_ms': round(metrics.total * 1000, 3),
+            **{
+                f'{name}_ms': round(seconds * 1000, 3)
+                for name, seconds in metrics.durations.items()
+            }
+        }))
+        if view_name is not None:
+            registry.observe(view_name, metrics)
+            self.check_budget(view_name, metrics)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.performance_view = get_view_name(view_func, request.method)
+
+    def process_template_response(self, request, response):
+        metrics = getattr(request, 'performance_metrics', None)
+        if metrics is None:
+            return response
+        start = time.perf_counter()
+
+        def rendered(response):
+            metrics.add('render', time.perf_counter() - start)
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    @staticmethod
+    def server_timing(metrics):
+        """Return the ``Server-Timing`` header value for ``metrics``."""
+        entries = [
+            f'db;dur={metrics.durations["db"] * 1000:.3f};'
+            f'desc="{metrics.queries} queries"'
+        ]
+        for name, seconds in metrics.durations.items():
+            if name != 'db':
+                entries.append(f'{name};dur={seconds * 1000:.3f}')
+        entries.append(f'total;dur={metrics.total * 1000:.3f}')
+        return ', '.join(entries)
+
+    @staticmethod
+    def check_budget(view_name, metrics):
+        """Raise ``QueryBudgetExceeded`` when the view is over budget."""
+        budgets = getattr(settings, 'CHATS_QUERY_BUDGETS', None) or {}
+        budget = budgets.get(view_name)
+        if budget is not None and metrics.queries > budget:
+            raise QueryBudgetExceeded(
+                f'{view_name} ran {metrics.queries} queries, '
+                f'its budget is {budget}.'
+            )
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Route safe-method requests to read replicas.
+
+    A client that writes is pinned to the primary with a cookie lasting
+    ``CHATS_READ_YOUR_WRITES_SECONDS``, so it reads its own writes (a sent
+    message shows up in the history it fetches next) despite replica lag.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        use_replica = (
+            request.method in SAFE_METHODS
+            and PIN_COOKIE not in request.COOKIES
+        )
+        with replica_reads(use_replica):
+            response = self.get_response(request)
+        if (
+            request.method not in SAFE_METHODS
+            and response.status_code < 400
+            and get_replicas()
+        ):
+            response.set_cookie(
+                PIN_COOKIE,
+                '1',
+                max_age=getattr(settings, 'CHATS_READ_YOUR_WRITES_SECONDS', 5),
+                httponly=True,
+                samesite='Lax'
+            )
+        return response
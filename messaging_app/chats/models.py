@@ -4,6 +4,7 @@ Models for the messaging app.
 import uuid
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.db.models.functions import RowNumber
 from django.utils import timezone
 
 
@@ -62,10 +63,23 @@ class Conversation(models.Model):
         through='ConversationParticipant'
     )
     created_at = models.DateTimeField(default=timezone.now)
+    # Messages may live on another database shard, so no FK constraints.
+    last_message = models.ForeignKey(
+        'Message',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        db_constraint=False
+    )
+    last_activity_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         db_table = 'conversation'
-        ordering = ['-created_at']
+        ordering = ['-last_activity_at']
+        indexes = [
+            models.Index(fields=['-last_activity_at']),
+        ]
 
     def __str__(self):
         participant_names = ', '.join([
@@ -88,10 +102,67 @@ class ConversationParticipant(models.Model):
         related_name='conversation_participants'
     )
     joined_at = models.DateTimeField(default=timezone.now)
+    last_read_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         db_table = 'conversation_participant'
         unique_together = ['conversation', 'participant']
+        indexes = [
+            models.Index(
+                fields=['participant', 'conversation'],
+                name='participant_conversation_idx'
+            ),
+        ]
+
+
+class MessageQuerySet(models.QuerySet):
+    """QuerySet for messages."""
+
+    def create(self, **kwargs):
+        """
+        Create a message, routed with the new message as the hint.
+
+        ``QuerySet.create`` picks the database before the message exists,
+        which would put sharded messages on ``default``.
+        """
+        message = self.model(**kwargs)
+        self._for_write = True
+        message.save(force_insert=True, using=self._db)
+        return message
+
+    def latest_per_conversation(self, limit=1):
+        """
+        Return the most recent messages of each conversation.
+
+        Rows are picked with a window function so many conversations are
+        resolved in one query, with the sender joined.
+        """
+        return self.annotate(
+            row_number=models.Window(
+                expression=RowNumber(),
+                partition_by=models.F('conversation'),
+                order_by=[models.F('sent_at').desc(), models.F('message_id').desc()]
+            )
+        ).filter(row_number__lte=limit).select_related('sender')
+
+    def record_activity(self, messages):
+        """
+        Make the newest of ``messages`` each conversation's last message.
+
+        Each conversation is moved with one conditional UPDATE, so concurrent
+        writers can never replace a newer last message with an older one.
+        """
+        newest = {}
+        for message in messages:
+            current = newest.get(message.conversation_id)
+            if current is None or message.sent_at > current.sent_at:
+                newest[message.conversation_id] = message
+        for conversation_id, message in newest.items():
+            Conversation.objects.filter(
+                models.Q(last_message__isnull=True)
+                | models.Q(last_activity_at__lt=message.sent_at),
+                conversation_id=conversation_id
+            ).update(last_message=message, last_activity_at=message.sent_at)
 
 
 class Message(models.Model):
@@ -102,19 +173,25 @@ class Message(models.Model):
         editable=False,
         db_index=True
     )
+    # Messages may be sharded away from users and conversations, so the
+    # foreign keys are not enforced by the database.
     sender = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        related_name='sent_messages'
+        related_name='sent_messages',
+        db_constraint=False
     )
     conversation = models.ForeignKey(
         Conversation,
         on_delete=models.CASCADE,
-        related_name='messages'
+        related_name='messages',
+        db_constraint=False
     )
     message_body = models.TextField(null=False)
     sent_at = models.DateTimeField(default=timezone.now)
 
+    objects = MessageQuerySet.as_manager()
+
     class Meta:
         db_table = 'message'
         ordering = ['-sent_at']
@@ -125,3 +202,40 @@ class Message(models.Model):
     def __str__(self):
         return f"Message from {self.sender.first_name} in {self.conversation.conversation_id}"
 
+
+class ArchivedMessage(models.Model):
+    """
+    A message moved out of the ``message`` table by ``archive_messages``.
+
+    Keeping old messages apart keeps the hot table and its indexes small;
+    history reads continue into this table past the hot boundary.
+    """
+    message_id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False
+    )
+    sender = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_messages',
+        db_constraint=False
+    )
+    conversation = models.ForeignKey(
+        Conversation,
+        on_delete=models.CASCADE,
+        related_name='archived_messages',
+        db_constraint=False
+    )
+    message_body = models.TextField(null=False)
+    sent_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'message_archive'
+        ordering = ['-sent_at']
+        indexes = [
+            models.Index(fields=['conversation', '-sent_at']),
+        ]
+
+    def __str__(self):
+        return f"Archived message from {self.sender.first_name} in {self.conversation.conversation_id}"
@@ -0,0 +1,37 @@
+"""
+Pagination classes for the messaging app.
+"""
+from rest_framework.pagination import CursorPagination
+
+
+class MessageCursorPagination(CursorPagination):
+    """
+    Keyset pagination for message history.
+
+    Pages seek on ``sent_at`` (breaking ties on ``message_id``) through the
+    ``(conversation, -sent_at)`` index instead of using OFFSET scans, never
+    issue a COUNT query, and keep stable cursors while new messages arrive.
+    """
+    ordering = ('-sent_at', '-message_id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_link_after(self, messages, page_size, base_url):
+        """
+        Return a next link for messages fetched outside the paginator.
+
+        ``messages`` must follow this paginator's ordering and hold one row
+        beyond ``page_size`` when older messages exist.
+        """
+        self.base_url = base_url
+        self.page_size = page_size
+        self.page = messages[:page_size]
+        self.has_next = len(messages) > page_size
+        self.has_previous = False
+        self.cursor = None
+        if not self.has_next:
+            return None
+        self.next_position = self._get_position_from_instance(
+            messages[page_size], self.ordering
+        )
+        return self.get_next_link()
@@ -0,0 +1,64 @@
+"""
+Parsers for the messaging app.
+"""
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+json_loads = orjson.loads if orjson is not None else json.loads
+
+
+def is_utf8(encoding):
+    """Return whether ``encoding`` names UTF-8."""
+    return encoding.lower().replace('_', '-') in ('utf-8', 'utf8')
+
+
+class ChatsJSONParser(JSONParser):
+    """
+    JSON parser using orjson when it is installed.
+
+    Bodies in another charset, and everything when orjson is missing, are
+    parsed by ``JSONParser``.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        """Decode the request body as JSON."""
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or not is_utf8(encoding):
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except ValueError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+class NDJSONParser(BaseParser):
+    """Parse newline-delimited JSON into a list of objects."""
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        """Decode one JSON document per non-empty line."""
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        items = []
+        if stream is None:
+            return items
+        for line_number, line in enumerate(stream, start=1):
+            line = line.decode(encoding).strip()
+            if not line:
+                continue
+            try:
+                items.append(json_loads(line))
+            except ValueError as exc:
+                raise ParseError(
+                    f'NDJSON parse error on line {line_number} - {exc}'
+                )
+        return items
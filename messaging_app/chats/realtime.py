@@ -0,0 +1,267 @@
+"""
+Realtime message delivery over ASGI websockets.
+
+Clients connect to ``/ws/messages/`` with their session cookie and receive
+every message created in their conversations as a JSON text frame, shaped
+like ``MessageSerializer`` output. Handshakes from an ``Origin`` outside
+``ALLOWED_HOSTS`` are refused, so other sites cannot open a socket with the
+user's cookie. The conversations are read when the socket connects; clients
+reconnect to receive conversations they joined since.
+
+Messages are fanned out through a broker. The default ``InMemoryBroker``
+delivers within one process; set ``CHATS_REALTIME_BROKER`` to the dotted path
+of another class with the same ``subscribe``/``unsubscribe``/``publish``
+interface to fan out across processes through a local broker. Brokers may
+also implement ``subscribed(channels)`` so messages nobody listens to are
+not serialized.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+from importlib import import_module
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db import close_old_connections, transaction
+from django.http.cookie import parse_cookie
+from django.http.request import validate_host
+from django.utils.module_loading import import_string
+
+from .models import ConversationParticipant
+from .renderers import ChatsJSONRenderer
+
+WEBSOCKET_PATH = '/ws/messages/'
+
+
+class Subscription:
+    """A websocket's queue of payloads for a set of conversations."""
+
+    def __init__(self, channels, max_queued=1000):
+        self.channels = set(channels)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=max_queued)
+
+    def put(self, payload):
+        """Queue a payload; safe to call from any thread."""
+        self.loop.call_soon_threadsafe(self._put_nowait, payload)
+
+    def _put_nowait(self, payload):
+        if self.queue.full():
+            # Drop the oldest payload rather than stall every publisher
+            # behind one slow client.
+            self.queue.get_nowait()
+        self.queue.put_nowait(payload)
+
+    async def get(self):
+        """Wait for the next payload."""
+        return await self.queue.get()
+
+
+class InMemoryBroker:
+    """Publish/subscribe fanout within a single process."""
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channels):
+        """Return a subscription receiving payloads for ``channels``."""
+        subscription = Subscription(channels)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Stop delivering payloads to ``subscription``."""
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+    def subscribed(self, channels):
+        """Return those of ``channels`` that have subscribers."""
+        with self._lock:
+            return {channel for channel in channels if channel in self._subscribers}
+
+    def publish(self, channel, payload):
+        """Deliver ``payload`` to every subscriber of ``channel``."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put(payload)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Return the process-wide broker configured in settings."""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                path = getattr(
+                    settings,
+                    'CHATS_REALTIME_BROKER',
+                    'chats.realtime.InMemoryBroker'
+                )
+                _broker = import_string(path)()
+    return _broker
+
+
+def message_rows(messages):
+    """Return ``MessageValuesSerializer`` rows for message instances."""
+    return [
+        {
+            'message_id': message.message_id,
+            'conversation_id': message.conversation_id,
+            'message_body': message.message_body,
+            'sent_at': message.sent_at,
+            'sender_id': message.sender_id,
+            'sender__first_name': message.sender.first_name,
+            'sender__last_name': message.sender.last_name,
+            'sender__role': message.sender.role
+        }
+        for message in messages
+    ]
+
+
+def publish_messages(messages):
+    """
+    Publish messages to their conversations once the transaction commits.
+
+    Payloads are built in the commit callback, outside the writer's
+    transaction, in one pass over the messages of subscribed channels.
+    """
+    from .serializers import serialize_message_rows
+    messages = list(messages)
+
+    def publish():
+        broker = get_broker()
+        channels = {str(message.conversation_id) for message in messages}
+        subscribed = getattr(broker, 'subscribed', None)
+        if subscribed is not None:
+            channels = subscribed(channels)
+        pending = [
+            message for message in messages
+            if str(message.conversation_id) in channels
+        ]
+        if not pending:
+            return
+        renderer = ChatsJSONRenderer()
+        for data in serialize_message_rows(message_rows(pending), {}):
+            broker.publish(data['conversation'], renderer.render(data).decode())
+
+    transaction.on_commit(publish)
+
+
+def get_scope_user(scope):
+    """Return the user for the session cookie sent with a websocket."""
+    close_old_connections()
+    try:
+        cookies = {}
+        for name, value in scope.get('headers', []):
+            if name == b'cookie':
+                cookies.update(parse_cookie(value.decode('latin1')))
+        engine = import_module(settings.SESSION_ENGINE)
+        session = engine.SessionStore(cookies.get(settings.SESSION_COOKIE_NAME))
+        return get_user(SimpleNamespace(session=session))
+    finally:
+        close_old_connections()
+
+
+def is_allowed_origin(scope):
+    """
+    Return whether the handshake's ``Origin`` host is in ``ALLOWED_HOSTS``.
+
+    Matches Channels' ``AllowedHostsOriginValidator``: a missing origin is
+    only accepted when every host is allowed, and ``DEBUG`` with no
+    ``ALLOWED_HOSTS`` allows localhost.
+    """
+    allowed_hosts = settings.ALLOWED_HOSTS
+    if settings.DEBUG and not allowed_hosts:
+        allowed_hosts = ['.localhost', '127.0.0.1', '[::1]']
+    origin = None
+    for name, value in scope.get('headers', []):
+        if name == b'origin':
+            origin = value.decode('latin1')
+    if origin is None:
+        return '*' in allowed_hosts
+    try:
+        host = urlsplit(origin).hostname
+    except ValueError:
+        return False
+    if not host:
+        return False
+    if ':' in host:
+        host = f'[{host}]'
+    return validate_host(host, allowed_hosts)
+
+
+def get_user_channels(user):
+    """Return the channels for every conversation the user is in."""
+    close_old_connections()
+    try:
+        return [
+            str(conversation_id)
+            for conversation_id in ConversationParticipant.objects.filter(
+                participant=user
+            ).values_list('conversation_id', flat=True)
+        ]
+    finally:
+        close_old_connections()
+
+
+async def websocket_application(scope, receive, send):
+    """
+    Stream new messages from the user's conversations to a websocket.
+
+    The conversations are those the user is in when the socket connects.
+    """
+    event = await receive()
+    if event['type'] != 'websocket.connect':
+        return
+    if scope['path'] != WEBSOCKET_PATH:
+        await send({'type': 'websocket.close', 'code': 4404})
+        return
+    if not is_allowed_origin(scope):
+        await send({'type': 'websocket.close', 'code': 4403})
+        return
+    user = await sync_to_async(get_scope_user)(scope)
+    if not user.is_authenticated:
+        await send({'type': 'websocket.close', 'code': 4401})
+        return
+    channels = await sync_to_async(get_user_channels)(user)
+
+    broker = get_broker()
+    subscription = broker.subscribe(channels)
+    await send({'type': 'websocket.accept'})
+    receiving = asyncio.ensure_future(receive())
+    try:
+        while True:
+            delivering = asyncio.ensure_future(subscription.get())
+            done, _ = await asyncio.wait(
+                {receiving, delivering},
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            if delivering in done:
+                await send({'type': 'websocket.send', 'text': delivering.result()})
+            else:
+                delivering.cancel()
+            if receiving in done:
+                if receiving.result()['type'] == 'websocket.disconnect':
+                    break
+                # Client frames are ignored; keep listening for disconnect.
+                receiving = asyncio.ensure_future(receive())
+    finally:
+        receiving.cancel()
+        broker.unsubscribe(subscription)
@@ -0,0 +1,136 @@
+"""
+Renderers for the messaging app.
+"""
+import json
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.compat import (
+    INDENT_SEPARATORS,
+    LONG_SEPARATORS,
+    SHORT_SEPARATORS
+)
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class ChatsJSONRenderer(JSONRenderer):
+    """
+    JSON renderer using orjson when it is installed.
+
+    orjson encodes UUIDs and datetimes natively, so DRF's encoder hook only
+    runs for the types it cannot handle (lazy strings, decimals, querysets).
+    The output is equivalent to ``JSONRenderer``'s except for float
+    formatting: exponents are written ``1e16`` rather than ``1e+16``, and
+    NaN and infinities are rendered as ``null`` instead of being rejected.
+    Indented or ASCII-only (``UNICODE_JSON = False``) output, data orjson
+    rejects, such as integers beyond 64 bits, and everything when orjson is
+    missing, go through the stdlib encoder.
+    """
+    stream_chunk_size = 100
+
+    def dumps(self, data, indent=None):
+        """Encode ``data`` as UTF-8 JSON."""
+        if (
+            orjson is not None
+            and indent is None
+            and self.compact
+            and not self.ensure_ascii
+        ):
+            # Non-string keys occur in DRF errors, such as ListField
+            # errors keyed by item index.
+            try:
+                ret = orjson.dumps(
+                    data,
+                    default=self.encoder_class().default,
+                    option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+                )
+            except TypeError:
+                # Such as integers beyond 64 bits; the stdlib encoder below
+                # handles them, or raises the same error for unknown types.
+                pass
+            else:
+                return ret.replace(
+                    '\u2028'.encode(), b'\\u2028'
+                ).replace('\u2029'.encode(), b'\\u2029')
+        if indent is not None:
+            separators = INDENT_SEPARATORS
+        else:
+            separators = SHORT_SEPARATORS if self.compact else LONG_SEPARATORS
+        ret = json.dumps(
+            data,
+            cls=self.encoder_class,
+            indent=indent,
+            ensure_ascii=self.ensure_ascii,
+            allow_nan=not self.strict,
+            separators=separators
+        )
+        ret = ret.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+        return ret.encode()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Render ``data`` into JSON, returning a bytestring."""
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        return self.dumps(
+            data, self.get_indent(accepted_media_type, renderer_context)
+        )
+
+    def iter_render(self, data, list_key='results'):
+        """
+        Yield the compact JSON encoding of ``data`` in chunks.
+
+        ``data`` is a dict holding a list under ``list_key``, such as a
+        paginated response. The list is encoded ``stream_chunk_size`` items
+        at a time so a large page is never held as one buffer; the joined
+        chunks equal ``render(data)``.
+        """
+        if not self.compact:
+            yield self.dumps(data)
+            return
+        yield b'{'
+        for index, (key, value) in enumerate(data.items()):
+            prefix = (b',' if index else b'') + self.dumps(key) + b':'
+            if key != list_key:
+                yield prefix + self.dumps(value)
+                continue
+            yield prefix + b'['
+            for start in range(0, len(value), self.stream_chunk_size):
+                chunk = value[start:start + self.stream_chunk_size]
+                yield (b',' if start else b'') + self.dumps(chunk)[1:-1]
+            yield b']'
+        yield b'}'
+
+
+def streaming_response(request, response, list_key='results'):
+    """
+    Return ``response`` as a streamed JSON response when its list is large.
+
+    Applies when the negotiated renderer is ``ChatsJSONRenderer`` and the
+    list holds at least ``CHATS_STREAMING_MIN_ITEMS`` items; any other
+    response is returned unchanged. Set the setting to 0 to disable.
+    """
+    renderer = getattr(request, 'accepted_renderer', None)
+    min_items = getattr(settings, 'CHATS_STREAMING_MIN_ITEMS', 100)
+    data = response.data
+    if (
+        not min_items
+        or not isinstance(renderer, ChatsJSONRenderer)
+        or not isinstance(data, dict)
+        or len(data.get(list_key) or ()) < min_items
+    ):
+        return response
+    streamed = StreamingHttpResponse(
+        renderer.iter_render(data, list_key),
+        status=response.status_code,
+        content_type=renderer.media_type
+    )
+    for name, value in response.items():
+        if name.lower() != 'content-type':
+            streamed[name] = value
+    return streamed
@@ -0,0 +1,156 @@
+"""
+Database routers for the messaging app.
+"""
+import contextvars
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, router
+
+from .sharding import get_shards, shard_for
+
+_replica_alias = contextvars.ContextVar('chats_replica_alias', default=None)
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """
+    Let reads made inside the block go to a replica.
+
+    One replica is picked when the block starts and used for all of its
+    reads, so they see the same snapshot whatever each replica's lag.
+    """
+    token = _replica_alias.set(pick_replica() if enabled else None)
+    try:
+        yield
+    finally:
+        _replica_alias.reset(token)
+
+
+def get_replicas():
+    """Return the aliases listed in ``CHATS_DATABASE_REPLICAS``."""
+    return list(getattr(settings, 'CHATS_DATABASE_REPLICAS', ()))
+
+
+class ShardRouter:
+    """
+    Send a conversation's messages, archived ones included, to its shard.
+
+    The shard is known when the query comes from a message or conversation
+    instance (saving a message, ``conversation.messages``); other message
+    queries are left to the next router, and user-scoped reads fan out
+    with ``chats.sharding.sharded_messages``.
+    """
+
+    sharded_models = ('chats.message', 'chats.archivedmessage')
+
+    def shard_for_hints(self, model, hints):
+        if model._meta.label_lower not in self.sharded_models or not get_shards():
+            return None
+        instance = hints.get('instance')
+        if instance is None:
+            return None
+        if instance._meta.label_lower in self.sharded_models:
+            conversation_id = instance.conversation_id
+        elif instance._meta.label_lower == 'chats.conversation':
+            conversation_id = instance.pk
+        else:
+            return None
+        return shard_for(conversation_id) if conversation_id else None
+
+    def db_for_read(self, model, **hints):
+        return self.shard_for_hints(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self.shard_for_hints(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        shards = get_shards()
+        if obj1._state.db in shards or obj2._state.db in shards:
+            return True
+        return None
+
+
+class ReplicaRouter:
+    """
+    Send reads to replicas while ``replica_reads`` is active.
+
+    ``ReplicaRoutingMiddleware`` enables it for safe-method requests that
+    are not pinned to the primary; everything else, writes included, uses
+    ``default``. Each block reads from one replica. Replicas are taken in
+    turn, skipping any that failed to connect within the last
+    ``CHATS_REPLICA_RETRY_SECONDS``; with none healthy, reads fall back to
+    the primary.
+    """
+
+    def __init__(self):
+        self._counter = itertools.count()
+        self._down_until = {}
+        self._lock = threading.Lock()
+
+    def check_health(self, alias):
+        """Return whether ``alias`` accepts connections."""
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError:
+            return False
+        return True
+
+    def mark_down(self, alias):
+        """Skip ``alias`` until its retry delay has passed."""
+        delay = getattr(settings, 'CHATS_REPLICA_RETRY_SECONDS', 30)
+        with self._lock:
+            self._down_until[alias] = time.monotonic() + delay
+
+    def reset(self):
+        """Forget every failed health check."""
+        with self._lock:
+            self._down_until.clear()
+
+    def is_down(self, alias):
+        """Return whether ``alias`` recently failed its health check."""
+        with self._lock:
+            until = self._down_until.get(alias)
+            if until is not None and until <= time.monotonic():
+                del self._down_until[alias]
+                until = None
+        return until is not None
+
+    def pick_replica(self):
+        """Return the next healthy replica, or ``None``."""
+        replicas = get_replicas()
+        if not replicas:
+            return None
+        start = next(self._counter)
+        for offset in range(len(replicas)):
+            alias = replicas[(start + offset) % len(replicas)]
+            if self.is_down(alias):
+                continue
+            if self.check_health(alias):
+                return alias
+            self.mark_down(alias)
+        return None
+
+    def db_for_read(self, model, **hints):
+        return _replica_alias.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Objects read from a replica must still be saved on the primary.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        primary_and_replicas = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if {obj1._state.db, obj2._state.db} <= primary_and_replicas:
+            return True
+        return None
+
+
+def pick_replica():
+    """Return a healthy replica from the installed ``ReplicaRouter``."""
+    for db_router in router.routers:
+        if isinstance(db_router, ReplicaRouter):
+            return db_router.pick_replica()
+    return None
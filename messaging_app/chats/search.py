@@ -0,0 +1,158 @@
+"""
+Full-text search over message bodies.
+
+SQLite databases get an FTS5 table indexing ``message.message_body`` that is
+kept in sync by triggers, so rows written with ``bulk_create`` or raw SQL are
+indexed too. PostgreSQL databases get a GIN index over a ``tsvector``
+expression. Other backends fall back to ``icontains``.
+
+The index is installed after ``migrate``. Rebuild it on SQLite after a
+``VACUUM``, which may renumber the rowids it is keyed on::
+
+    python manage.py rebuild_search_index
+"""
+from django.db import connections
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+from .archive import TieredQuerySet
+from .sharding import ShardedQuerySet
+
+SQLITE_INSTALL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS message_fts USING fts5(
+        message_body, content='message', content_rowid='rowid'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS message_fts_insert AFTER INSERT ON message
+    BEGIN
+        INSERT INTO message_fts(rowid, message_body)
+        VALUES (new.rowid, new.message_body);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS message_fts_delete AFTER DELETE ON message
+    BEGIN
+        INSERT INTO message_fts(message_fts, rowid, message_body)
+        VALUES ('delete', old.rowid, old.message_body);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS message_fts_update
+    AFTER UPDATE OF message_body ON message
+    BEGIN
+        INSERT INTO message_fts(message_fts, rowid, message_body)
+        VALUES ('delete', old.rowid, old.message_body);
+        INSERT INTO message_fts(rowid, message_body)
+        VALUES (new.rowid, new.message_body);
+    END
+    """,
+]
+
+SQLITE_REBUILD = "INSERT INTO message_fts(message_fts) VALUES ('rebuild')"
+
+POSTGRES_VECTOR = "to_tsvector('english', message.message_body)"
+
+POSTGRES_INSTALL = [
+    f"""
+    CREATE INDEX IF NOT EXISTS message_body_search
+    ON message USING GIN ({POSTGRES_VECTOR})
+    """,
+]
+
+
+def install_search_index(using='default'):
+    """Create the search index for a database if it does not exist."""
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        existed = 'message_fts' in connection.introspection.table_names()
+        with connection.cursor() as cursor:
+            for statement in SQLITE_INSTALL:
+                cursor.execute(statement)
+            if not existed:
+                cursor.execute(SQLITE_REBUILD)
+    elif connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            for statement in POSTGRES_INSTALL:
+                cursor.execute(statement)
+
+
+def rebuild_search_index(using='default'):
+    """Re-index every message from the message table."""
+    connection = connections[using]
+    install_search_index(using)
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(SQLITE_REBUILD)
+
+
+def sqlite_match_query(terms):
+    """Quote each term so user input cannot use FTS5 query syntax."""
+    return ' '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+
+def search_messages(queryset, terms, ranked=False):
+    """
+    Filter a message queryset to rows matching every search term.
+
+    With ``ranked`` the result is ordered by relevance, best first, and
+    each row carries a ``search_rank`` attribute.
+    """
+    if not terms:
+        return queryset
+    if isinstance(queryset, TieredQuerySet):
+        # Only the hot table is indexed.
+        queryset = queryset.hot
+    if isinstance(queryset, ShardedQuerySet):
+        return queryset.apply(search_messages, terms, ranked)
+    connection = connections[queryset.db]
+    if connection.vendor == 'sqlite':
+        match = sqlite_match_query(terms)
+        queryset = queryset.filter(RawSQL(
+            'message.rowid IN '
+            '(SELECT rowid FROM message_fts WHERE message_fts MATCH %s)',
+            [match],
+            output_field=BooleanField()
+        ))
+        # bm25() is lower for better matches, so negate it. It can only be
+        # read from a MATCH query; LIMIT -1 stops SQLite from flattening
+        # that query into a MATCH per row, so it runs once and each row
+        # looks its rank up through an automatic index on rowid.
+        rank = RawSQL(
+            'SELECT fts.rank FROM ('
+            'SELECT rowid AS id, -bm25(message_fts) AS rank FROM message_fts '
+            'WHERE message_fts MATCH %s LIMIT -1'
+            ') AS fts WHERE fts.id = message.rowid',
+            [match],
+            output_field=FloatField()
+        )
+    elif connection.vendor == 'postgresql':
+        query = "plainto_tsquery('english', %s)"
+        search = ' '.join(terms)
+        queryset = queryset.filter(RawSQL(
+            f'{POSTGRES_VECTOR} @@ {query}', [search],
+            output_field=BooleanField()
+        ))
+        rank = RawSQL(
+            f'ts_rank({POSTGRES_VECTOR}, {query})', [search],
+            output_field=FloatField()
+        )
+    else:
+        for term in terms:
+            queryset = queryset.filter(message_body__icontains=term)
+        return queryset
+    if ranked:
+        queryset = queryset.annotate(search_rank=rank).order_by(
+            '-search_rank', '-sent_at'
+        )
+    return queryset
+
+
+class MessageSearchFilter(filters.SearchFilter):
+    """SearchFilter backed by the message full-text index."""
+
+    def filter_queryset(self, request, queryset, view):
+        """Filter messages using the full-text index."""
+        return search_messages(queryset, self.get_search_terms(request))
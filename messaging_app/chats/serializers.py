@@ -1,9 +1,16 @@
 """
 Serializers for the messaging app.
 """
-from rest_framework import serializers
+from django.conf import settings
+from django.db import transaction
+from rest_framework import ISO_8601, serializers
+from rest_framework.reverse import reverse
+from rest_framework.settings import api_settings
 from rest_framework.serializers import ValidationError
+from .archive import get_hot_boundary
 from .models import User, Conversation, Message, ConversationParticipant
+from .pagination import MessageCursorPagination
+from .sharding import attach_senders, is_sharded
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -37,9 +44,39 @@ class UserSerializer(serializers.ModelSerializer):
         return user
 
 
+def summarize_user(user):
+    """Return the compact representation used wherever a user is nested."""
+    return {
+        'user_id': str(user.user_id),
+        'name': user.get_full_name(),
+        'role': user.role
+    }
+
+
+def get_user_summary(user, context):
+    """
+    Return the summary of ``user``, building it once per serializer context.
+
+    The context keeps an identity map keyed by user id, so a sender repeated
+    across a page of messages is only summarized once per response.
+    """
+    summaries = context.setdefault('user_summaries', {})
+    summary = summaries.get(user.pk)
+    if summary is None:
+        summary = summaries[user.pk] = summarize_user(user)
+    return summary
+
+
+class UserSummaryField(serializers.RelatedField):
+    """Field rendering a related user as its summary; use read-only."""
+
+    def to_representation(self, value):
+        return get_user_summary(value, self.context)
+
+
 class MessageSerializer(serializers.ModelSerializer):
     """Serializer for Message model."""
-    sender = UserSerializer(read_only=True)
+    sender = UserSummaryField(read_only=True)
 
     class Meta:
         model = Message
@@ -59,9 +96,111 @@ class MessageSerializer(serializers.ModelSerializer):
         return value
 
 
+class MessageBulkSerializer(serializers.Serializer):
+    """
+    Lightweight serializer for one item of a bulk message ingest.
+
+    The conversation is accepted as a plain id so a batch can check
+    membership for every item in a single query.
+    """
+    conversation = serializers.UUIDField()
+    message_body = serializers.CharField()
+
+    validate_message_body = MessageSerializer.validate_message_body
+
+
+class ConversationMessageSerializer(MessageSerializer):
+    """Message serializer referencing the sender by id only."""
+    sender = serializers.UUIDField(source='sender_id', read_only=True)
+
+
+def format_datetimes(values):
+    """
+    Format datetimes as ``DateTimeField`` does, resolving the output format
+    and time zone once for the whole batch.
+    """
+    field = serializers.DateTimeField()
+    time_zone = field.default_timezone()
+    if api_settings.DATETIME_FORMAT != ISO_8601 or time_zone is None:
+        return [field.to_representation(value) for value in values]
+    formatted = []
+    for value in values:
+        if value is None or value.tzinfo is None:
+            formatted.append(field.to_representation(value))
+            continue
+        value = value.astimezone(time_zone).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        formatted.append(value)
+    return formatted
+
+
+def serialize_message_rows(rows, context):
+    """
+    Build ``MessageSerializer`` representations from ``.values()`` rows.
+
+    Senders are summarized once each through the context's identity map.
+    """
+    rows = list(rows)
+    summaries = context.setdefault('user_summaries', {})
+    sent_at = format_datetimes([row['sent_at'] for row in rows])
+    messages = []
+    for row, row_sent_at in zip(rows, sent_at):
+        sender = summaries.get(row['sender_id'])
+        if sender is None:
+            first_name = row['sender__first_name']
+            last_name = row['sender__last_name']
+            sender = summaries[row['sender_id']] = {
+                'user_id': str(row['sender_id']),
+                'name': f'{first_name} {last_name}'.strip(),
+                'role': row['sender__role']
+            }
+        messages.append({
+            'message_id': str(row['message_id']),
+            'sender': sender,
+            'conversation': str(row['conversation_id']),
+            'message_body': row['message_body'],
+            'sent_at': row_sent_at
+        })
+    return messages
+
+
+class MessageValuesListSerializer(serializers.ListSerializer):
+    """Serialize a page of message rows in a single pass."""
+
+    def to_representation(self, data):
+        return serialize_message_rows(data, self.context)
+
+
+class MessageValuesSerializer(serializers.BaseSerializer):
+    """
+    Read-only ``Message`` serializer for rows from ``.values()``.
+
+    Renders the same JSON as ``MessageSerializer`` while skipping model
+    instances and per-field serializer machinery. The queryset must select
+    ``values_fields``.
+    """
+    values_fields = (
+        'message_id',
+        'conversation_id',
+        'message_body',
+        'sent_at',
+        'sender_id',
+        'sender__first_name',
+        'sender__last_name',
+        'sender__role'
+    )
+
+    class Meta:
+        list_serializer_class = MessageValuesListSerializer
+
+    def to_representation(self, instance):
+        return serialize_message_rows([instance], self.context)[0]
+
+
 class ConversationParticipantSerializer(serializers.ModelSerializer):
     """Serializer for ConversationParticipant."""
-    participant = UserSerializer(read_only=True)
+    participant = UserSummaryField(read_only=True)
 
     class Meta:
         model = ConversationParticipant
@@ -70,12 +209,19 @@ class ConversationParticipantSerializer(serializers.ModelSerializer):
 
 
 class ConversationSerializer(serializers.ModelSerializer):
-    """Serializer for Conversation model with nested messages."""
-    participants = UserSerializer(many=True, read_only=True)
-    messages = MessageSerializer(many=True, read_only=True)
-    participant_ids = serializers.PrimaryKeyRelatedField(
-        many=True,
-        queryset=User.objects.all(),
+    """
+    Serializer for Conversation model with its most recent messages.
+
+    Only a bounded window of messages is embedded; ``messages_next`` links
+    to the paginated history for the rest. Message senders are referenced
+    by id and side-loaded once each in ``users``.
+    """
+    participants = UserSummaryField(many=True, read_only=True)
+    messages = serializers.SerializerMethodField()
+    messages_next = serializers.SerializerMethodField()
+    users = serializers.SerializerMethodField()
+    participant_ids = serializers.ListField(
+        child=serializers.UUIDField(),
         write_only=True,
         source='participants'
     )
@@ -87,33 +233,119 @@ class ConversationSerializer(serializers.ModelSerializer):
             'participants',
             'participant_ids',
             'messages',
+            'messages_next',
+            'users',
             'created_at'
         ]
         read_only_fields = ['conversation_id', 'created_at']
 
+    @staticmethod
+    def recent_messages_limit():
+        """Return how many recent messages a conversation embeds."""
+        return getattr(settings, 'CONVERSATION_RECENT_MESSAGES', 20)
+
+    def get_recent_window(self, obj):
+        """
+        Return the recent messages plus one extra when more exist.
+
+        Uses the ``recent_messages`` prefetch when the view provided it, and
+        tops the window up from the archive when the hot messages run out.
+        The window is built once per conversation and kept on
+        ``recent_window``, as several fields read it.
+        """
+        if hasattr(obj, 'recent_window'):
+            return obj.recent_window
+        limit = self.recent_messages_limit() + 1
+        if not hasattr(obj, 'recent_messages'):
+            messages = obj.messages.order_by('-sent_at', '-message_id')
+            if is_sharded():
+                obj.recent_messages = attach_senders(messages[:limit])
+            else:
+                obj.recent_messages = list(
+                    messages.select_related('sender')[:limit]
+                )
+        window = obj.recent_messages
+        if len(window) < limit and get_hot_boundary() is not None:
+            missing = limit - len(window)
+            archived = obj.archived_messages.order_by('-sent_at', '-message_id')
+            if is_sharded():
+                archived = attach_senders(archived[:missing])
+            else:
+                archived = archived.select_related('sender')[:missing]
+            window = sorted(
+                [*window, *archived],
+                key=lambda message: (message.sent_at, message.message_id),
+                reverse=True
+            )
+        obj.recent_window = window
+        return window
+
+    def get_messages(self, obj):
+        """Get the most recent messages, newest first."""
+        window = self.get_recent_window(obj)[:self.recent_messages_limit()]
+        return ConversationMessageSerializer(window, many=True).data
+
+    def get_messages_next(self, obj):
+        """Get a cursor link to messages older than the embedded window."""
+        base_url = reverse(
+            'conversation-messages',
+            kwargs={'pk': obj.conversation_id},
+            request=self.context.get('request')
+        )
+        return MessageCursorPagination().get_link_after(
+            self.get_recent_window(obj),
+            self.recent_messages_limit(),
+            base_url
+        )
+
+    def get_users(self, obj):
+        """Get each participant and message sender, keyed by user id."""
+        users = {user.user_id: user for user in obj.participants.all()}
+        window = self.get_recent_window(obj)[:self.recent_messages_limit()]
+        for message in window:
+            users.setdefault(message.sender_id, message.sender)
+        return {
+            str(user_id): get_user_summary(user, self.context)
+            for user_id, user in users.items()
+        }
+
     def validate_participant_ids(self, value):
-        """Validate that at least one participant is provided."""
+        """
+        Validate participant ids and resolve them to users.
+
+        All ids are looked up in a single query.
+        """
         if not value or len(value) == 0:
             raise ValidationError("At least one participant is required.")
-        if len(value) < 2:
+        user_ids = list(dict.fromkeys(value))
+        if len(user_ids) < 2:
             raise ValidationError("A conversation must have at least 2 participants.")
-        return value
+        users = User.objects.in_bulk(user_ids)
+        missing = [str(user_id) for user_id in user_ids if user_id not in users]
+        if missing:
+            raise ValidationError(
+                f"Invalid participant ids: {', '.join(missing)}."
+            )
+        return [users[user_id] for user_id in user_ids]
 
+    @transaction.atomic
     def create(self, validated_data):
-        """Create conversation and add participants."""
+        """Create conversation and add participants in one insert."""
         participants = validated_data.pop('participants', [])
         conversation = Conversation.objects.create(**validated_data)
-        for participant in participants:
-            ConversationParticipant.objects.create(
+        ConversationParticipant.objects.bulk_create([
+            ConversationParticipant(
                 conversation=conversation,
                 participant=participant
             )
+            for participant in participants
+        ])
         return conversation
 
 
 class ConversationListSerializer(serializers.ModelSerializer):
     """Simplified serializer for listing conversations."""
-    participants = UserSerializer(many=True, read_only=True)
+    participants = UserSummaryField(many=True, read_only=True)
     last_message = serializers.SerializerMethodField()
     unread_count = serializers.SerializerMethodField()
 
@@ -124,23 +356,24 @@ class ConversationListSerializer(serializers.ModelSerializer):
             'participants',
             'last_message',
             'unread_count',
+            'last_activity_at',
             'created_at'
         ]
-        read_only_fields = ['conversation_id', 'created_at']
+        read_only_fields = ['conversation_id', 'last_activity_at', 'created_at']
 
     def get_last_message(self, obj):
         """Get the last message in the conversation."""
-        last_msg = obj.messages.first()
+        last_msg = obj.last_message
         if last_msg:
             return {
                 'message_id': last_msg.message_id,
-                'sender': UserSerializer(last_msg.sender).data,
+                'sender': get_user_summary(last_msg.sender, self.context),
                 'message_body': last_msg.message_body,
                 'sent_at': last_msg.sent_at
             }
         return None
 
     def get_unread_count(self, obj):
-        """Get unread message count (placeholder)."""
-        return 0
+        """Get unread message count for the requesting user."""
+        return getattr(obj, 'unread_count', 0)
 
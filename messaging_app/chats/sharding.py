@@ -0,0 +1,253 @@
+"""
+Horizontal sharding of messages by conversation.
+
+With ``CHATS_MESSAGE_SHARDS`` listing database aliases, each conversation's
+messages live on one shard picked from a hash of its ``conversation_id``.
+Archived messages stay on their conversation's shard. Users, conversations
+and participants stay on ``default``; ``ShardRouter`` sends message reads
+and writes to the shard whenever the conversation is known from a model
+instance, and ``ShardedQuerySet`` fans user-scoped queries out to every
+shard, merging the rows in order.
+
+Message rows are not joined to users on a shard, so senders are loaded
+from ``default`` with ``attach_senders``.
+"""
+import hashlib
+import heapq
+import inspect
+from collections import defaultdict
+from functools import cmp_to_key
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import QuerySet
+
+
+def get_shards():
+    """Return the message shard aliases, empty when sharding is off."""
+    return list(getattr(settings, 'CHATS_MESSAGE_SHARDS', ()))
+
+
+def is_sharded():
+    """Return whether messages are sharded."""
+    return bool(get_shards())
+
+
+def shard_for(conversation_id, shards=None):
+    """Return the alias holding ``conversation_id``'s messages."""
+    shards = get_shards() if shards is None else shards
+    digest = hashlib.md5(str(conversation_id).encode()).digest()
+    return shards[int.from_bytes(digest[:8], 'big') % len(shards)]
+
+
+def group_by_shard(conversation_ids):
+    """Map each shard alias to the given conversation ids it holds."""
+    groups = defaultdict(list)
+    for conversation_id in conversation_ids:
+        groups[shard_for(conversation_id)].append(conversation_id)
+    return groups
+
+
+def sort_value(row, field):
+    """Return ``field`` of a model instance or a ``.values()`` row."""
+    return row[field] if isinstance(row, dict) else getattr(row, field)
+
+
+def _compare(ordering):
+    """Return a comparison function for rows following ``ordering``."""
+    fields = [
+        (name.lstrip('-'), -1 if name.startswith('-') else 1)
+        for name in ordering
+    ]
+
+    def compare(left, right):
+        for field, direction in fields:
+            a, b = sort_value(left, field), sort_value(right, field)
+            if a != b:
+                return direction * (-1 if a < b else 1)
+        return 0
+
+    return compare
+
+
+class ShardedQuerySet:
+    """
+    The same query run on several shards, read as one ordered result.
+
+    Queryset methods are applied to every shard's queryset; other attributes,
+    such as ``model``, are read from the first. Slices fetch at most ``stop``
+    rows from each shard and merge them by the query's ``order_by``, so a
+    page costs one bounded query per shard.
+    """
+
+    def __init__(self, querysets):
+        self.querysets = list(querysets)
+
+    def __getattr__(self, name):
+        attributes = [getattr(queryset, name) for queryset in self.querysets]
+        # Only methods, including a nested ShardedQuerySet's: ``model`` is
+        # callable too but must be returned as is, for
+        # ``except queryset.model.DoesNotExist``.
+        if not inspect.isroutine(attributes[0]):
+            return attributes[0]
+
+        def method(*args, **kwargs):
+            results = [attribute(*args, **kwargs) for attribute in attributes]
+            if isinstance(results[0], (QuerySet, ShardedQuerySet)):
+                return self.derive(results)
+            return results
+
+        return method
+
+    def derive(self, querysets):
+        """Return a queryset of the same kind over ``querysets``."""
+        return ShardedQuerySet(querysets)
+
+    def apply(self, func, *args, **kwargs):
+        """Return ``func(queryset, ...)`` applied to every shard."""
+        return self.derive(
+            func(queryset, *args, **kwargs) for queryset in self.querysets
+        )
+
+    def get_ordering(self):
+        """Return the ``order_by`` the shards' rows follow."""
+        query = self.querysets[0].query
+        if query.order_by:
+            return list(query.order_by)
+        if query.default_ordering:
+            return list(query.get_meta().ordering)
+        return []
+
+    def merge(self, limit=None):
+        """Return up to ``limit`` rows from all shards, merged in order."""
+        querysets = self.querysets
+        if limit is not None:
+            querysets = [queryset[:limit] for queryset in querysets]
+        return self.merge_rows(
+            [list(queryset) for queryset in querysets], limit
+        )
+
+    def merge_rows(self, row_lists, limit=None):
+        """Merge lists of rows, each already in order, into one."""
+        key = cmp_to_key(_compare(self.get_ordering()))
+        return list(heapq.merge(*row_lists, key=key))[:limit]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            if index.step is not None or index.stop is None:
+                return self.merge()[index]
+            return self.merge(index.stop)[index.start or 0:]
+        return self.merge(index + 1)[index]
+
+    def __iter__(self):
+        return iter(self.merge())
+
+    def __len__(self):
+        return self.count()
+
+    def get(self, *args, **kwargs):
+        """Return the one matching row, looking on each shard in turn."""
+        model = self.querysets[0].model
+        for queryset in self.querysets:
+            try:
+                return queryset.get(*args, **kwargs)
+            except queryset.model.DoesNotExist:
+                continue
+        raise model.DoesNotExist(
+            f'{model._meta.object_name} matching query does not exist.'
+        )
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def exists(self):
+        return any(queryset.exists() for queryset in self.querysets)
+
+
+def sharded_messages(conversation_ids, model=None):
+    """
+    Return a ``ShardedQuerySet`` of the conversations' messages, or of
+    their archived messages when ``model`` is ``ArchivedMessage``.
+    """
+    from .models import Message
+    model = model or Message
+    groups = group_by_shard(conversation_ids)
+    if not groups:
+        return ShardedQuerySet([model.objects.none()])
+    return ShardedQuerySet(
+        model.objects.using(shard).filter(conversation_id__in=ids)
+        for shard, ids in groups.items()
+    )
+
+
+def attach_senders(messages):
+    """Set each message's sender with one query on ``default``."""
+    from .models import User
+    messages = list(messages)
+    senders = User.objects.in_bulk({message.sender_id for message in messages})
+    for message in messages:
+        if message.sender_id in senders:
+            message.sender = senders[message.sender_id]
+    return messages
+
+
+def attach_last_messages(conversations):
+    """Set each conversation's last message with one query per shard."""
+    from .models import Message
+    conversations = [c for c in conversations if c.last_message_id]
+    messages = {}
+    for shard, ids in group_by_shard(
+        {c.conversation_id: c.last_message_id for c in conversations}
+    ).items():
+        last_message_ids = [
+            c.last_message_id for c in conversations if c.conversation_id in ids
+        ]
+        messages.update(
+            Message.objects.using(shard).in_bulk(last_message_ids)
+        )
+    attach_senders(messages.values())
+    for conversation in conversations:
+        if conversation.last_message_id in messages:
+            conversation.last_message = messages[conversation.last_message_id]
+
+
+def bulk_create_messages(messages, batch_size=None):
+    """Insert ``messages``, each on its conversation's shard."""
+    from .models import Message
+    if not is_sharded():
+        return Message.objects.bulk_create(messages, batch_size=batch_size)
+    groups = defaultdict(list)
+    for message in messages:
+        groups[shard_for(message.conversation_id)].append(message)
+    for shard, group in groups.items():
+        with transaction.atomic(using=shard):
+            Message.objects.using(shard).bulk_create(
+                group, batch_size=batch_size
+            )
+    return messages
+
+
+def delete_rows(model, pks, using):
+    """
+    Delete ``model`` rows by primary key with plain SQL.
+
+    For rows that were copied elsewhere or whose conversation is gone:
+    unlike ``QuerySet.delete()``, no signals are sent and nothing
+    referencing the rows is cascaded or set to null.
+    """
+    connection = connections[using]
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(model._meta.pk.column)
+    values = [
+        model._meta.pk.get_db_prep_value(pk, connection) for pk in pks
+    ]
+    # Stay within the backend's limit on query parameters.
+    batch_size = connection.features.max_query_params or len(values) or 1
+    with connection.cursor() as cursor:
+        for start in range(0, len(values), batch_size):
+            batch = values[start:start + batch_size]
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(
+                f'DELETE FROM {table} WHERE {column} IN ({placeholders})',
+                batch
+            )
@@ -0,0 +1,123 @@
+"""
+Signal handlers for the messaging app.
+"""
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete
+)
+from django.dispatch import receiver
+
+from .cache import invalidate_conversations
+from .models import (
+    ArchivedMessage,
+    Conversation,
+    ConversationParticipant,
+    Message
+)
+from .sharding import delete_rows, is_sharded, shard_for
+
+
+@receiver(post_save, sender=Message)
+def message_saved(sender, instance, created, **kwargs):
+    """Make a new message its conversation's last message."""
+    if created:
+        Message.objects.record_activity([instance])
+
+
+@receiver(post_delete, sender=Message)
+def message_deleted(sender, instance, **kwargs):
+    """Fall back to the previous message when the last one is deleted."""
+    if isinstance(kwargs.get('origin'), Conversation):
+        # The conversation is being deleted with all of its messages.
+        return
+    conversations = Conversation.objects.filter(
+        conversation_id=instance.conversation_id
+    )
+    if not is_sharded():
+        previous = Message.objects.filter(
+            conversation=OuterRef('pk')
+        ).order_by('-sent_at', '-message_id').values('message_id')[:1]
+        conversations.filter(last_message__isnull=True).update(
+            last_message=Subquery(previous)
+        )
+        return
+    # The message's shard is not the conversation's database, so
+    # SET_NULL did not reach the conversation; look the previous message
+    # up on the shard instead.
+    previous = Message.objects.db_manager(hints={'instance': instance}).filter(
+        conversation_id=instance.conversation_id
+    ).order_by('-sent_at', '-message_id').values_list(
+        'message_id', flat=True
+    ).first()
+    conversations.filter(
+        Q(last_message__isnull=True) | Q(last_message=instance.pk)
+    ).update(last_message=previous)
+
+
+@receiver(post_save, sender=Message)
+@receiver(post_delete, sender=Message)
+def message_changed(sender, instance, **kwargs):
+    """
+    Invalidate cached responses for the message's conversation.
+
+    Registered after the handlers above so it runs once they have updated
+    the conversation. Messages deleted along with their conversation are
+    covered by ``conversation_deleting``.
+    """
+    if isinstance(kwargs.get('origin'), Conversation):
+        return
+    invalidate_conversations([instance.conversation_id])
+
+
+@receiver(pre_delete, sender=Conversation)
+def conversation_deleting(sender, instance, **kwargs):
+    """
+    Invalidate cached responses for a conversation about to be deleted.
+
+    Runs before the cascade removes the participants whose inboxes listed
+    it.
+    """
+    invalidate_conversations([instance.conversation_id])
+
+
+@receiver(post_delete, sender=Conversation)
+def conversation_deleted(sender, instance, **kwargs):
+    """
+    Delete a sharded conversation's messages, archived ones included.
+
+    The delete cascade only reaches the conversation's own database, not
+    the shard holding its messages.
+    """
+    if not is_sharded():
+        return
+    shard = shard_for(instance.conversation_id)
+    with transaction.atomic(using=shard):
+        for model in (Message, ArchivedMessage):
+            message_ids = model.objects.using(shard).filter(
+                conversation_id=instance.conversation_id
+            ).values_list('message_id', flat=True)
+            delete_rows(model, list(message_ids), shard)
+
+
+@receiver(post_save, sender=ConversationParticipant)
+@receiver(post_delete, sender=ConversationParticipant)
+def participant_changed(sender, instance, **kwargs):
+    """Invalidate cached responses for the conversation and participant."""
+    if isinstance(kwargs.get('origin'), Conversation):
+        return
+    invalidate_conversations([instance.conversation_id], [instance.participant_id])
+
+
+@receiver(m2m_changed, sender=Conversation.participants.through)
+def participants_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Invalidate cached responses when participants are added or removed."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        invalidate_conversations(pk_set or (), [instance.pk])
+    else:
+        invalidate_conversations([instance.pk], pk_set or ())
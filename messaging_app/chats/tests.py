@@ -1,9 +1,37 @@
 """
 Tests for the chats app.
 """
-from django.test import TestCase
+import json
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import OperationalError, connection, connections, router
 from django.contrib.auth import get_user_model
-from .models import Conversation, Message
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from .models import (
+    ArchivedMessage, Conversation, ConversationParticipant, Message
+)
+from .cache import invalidate_conversations
+from .metrics import registry
+from .middleware import QueryBudgetExceeded
+from .parsers import ChatsJSONParser
+from .routers import ReplicaRouter, replica_reads
+from .sharding import shard_for
+from .renderers import ChatsJSONRenderer
+from .serializers import MessageSerializer, MessageValuesSerializer
+from .realtime import WEBSOCKET_PATH, websocket_application
 
 User = get_user_model()
 
@@ -95,3 +123,1708 @@ class MessageModelTest(TestCase):
         self.assertIn(self.user.first_name, str(self.message))
         self.assertIn(str(self.conversation.conversation_id), str(self.message))
 
+
+class ConversationListQueryTest(TestCase):
+    """Test the conversation list runs in a constant number of queries."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user1 = User.objects.create_user(
+            username='user1',
+            email='user1@example.com',
+            password='testpass123',
+            first_name='User',
+            last_name='One'
+        )
+        self.user2 = User.objects.create_user(
+            username='user2',
+            email='user2@example.com',
+            password='testpass123',
+            first_name='User',
+            last_name='Two'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user1)
+
+    def create_conversations(self, count):
+        """Create conversations with a couple of messages each."""
+        for _ in range(count):
+            conversation = Conversation.objects.create()
+            conversation.participants.add(self.user1, self.user2)
+            Message.objects.create(
+                sender=self.user1,
+                conversation=conversation,
+                message_body='First'
+            )
+            Message.objects.create(
+                sender=self.user2,
+                conversation=conversation,
+                message_body='Latest'
+            )
+
+    def count_list_queries(self):
+        """Return the number of queries issued by the list endpoint."""
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/conversations/')
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response.data['results']
+
+    def test_query_count_is_constant(self):
+        """Test query count does not grow with the page size."""
+        self.create_conversations(2)
+        small_count, small_results = self.count_list_queries()
+        self.create_conversations(8)
+        large_count, large_results = self.count_list_queries()
+        self.assertEqual(len(small_results), 2)
+        self.assertEqual(len(large_results), 10)
+        self.assertEqual(small_count, large_count)
+
+    def test_last_message(self):
+        """Test the last message and its sender are returned."""
+        self.create_conversations(1)
+        _, results = self.count_list_queries()
+        last_message = results[0]['last_message']
+        self.assertEqual(last_message['message_body'], 'Latest')
+        self.assertEqual(last_message['sender'], {
+            'user_id': str(self.user2.user_id),
+            'name': 'User Two',
+            'role': 'guest'
+        })
+        self.assertEqual(len(results[0]['participants']), 2)
+
+
+class UnreadCountTest(TestCase):
+    """Test unread counts backed by participant read cursors."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user1 = User.objects.create_user(
+            username='user1',
+            email='user1@example.com',
+            password='testpass123',
+            first_name='User',
+            last_name='One'
+        )
+        self.user2 = User.objects.create_user(
+            username='user2',
+            email='user2@example.com',
+            password='testpass123',
+            first_name='User',
+            last_name='Two'
+        )
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.user1, self.user2)
+        for body in ('One', 'Two', 'Three'):
+            Message.objects.create(
+                sender=self.user2,
+                conversation=self.conversation,
+                message_body=body
+            )
+        Message.objects.create(
+            sender=self.user1,
+            conversation=self.conversation,
+            message_body='Own message'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user1)
+
+    def get_unread_count(self):
+        """Return the unread count reported by the list endpoint."""
+        response = self.client.get('/api/conversations/')
+        return response.data['results'][0]['unread_count']
+
+    def test_unread_count_excludes_own_messages(self):
+        """Test messages from other participants are counted."""
+        self.assertEqual(self.get_unread_count(), 3)
+
+    def test_mark_read(self):
+        """Test marking a conversation read resets the count."""
+        url = f'/api/conversations/{self.conversation.conversation_id}/mark_read/'
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_unread_count(), 0)
+        Message.objects.create(
+            sender=self.user2,
+            conversation=self.conversation,
+            message_body='Four'
+        )
+        self.assertEqual(self.get_unread_count(), 1)
+
+    def test_mark_read_requires_participant(self):
+        """Test non-participants cannot move a read cursor."""
+        outsider = User.objects.create_user(
+            username='outsider',
+            email='outsider@example.com',
+            password='testpass123',
+            first_name='Out',
+            last_name='Sider'
+        )
+        self.client.force_authenticate(user=outsider)
+        url = f'/api/conversations/{self.conversation.conversation_id}/mark_read/'
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 404)
+
+
+class MessageCursorPaginationTest(TestCase):
+    """Test keyset pagination of message history."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(
+            username='sender',
+            email='sender@example.com',
+            password='testpass123',
+            first_name='Sender',
+            last_name='User'
+        )
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.user)
+        start = timezone.now()
+        Message.objects.bulk_create([
+            Message(
+                sender=self.user,
+                conversation=self.conversation,
+                message_body=f'Message {i}',
+                sent_at=start - timedelta(minutes=i)
+            )
+            for i in range(25)
+        ])
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def collect_pages(self, url):
+        """Follow next links and return message bodies in order."""
+        bodies = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            bodies.extend(m['message_body'] for m in response.data['results'])
+            url = response.data['next']
+        return bodies
+
+    def test_message_list_pages(self):
+        """Test message list pages through every message newest first."""
+        bodies = self.collect_pages(
+            f'/api/messages/?conversation={self.conversation.conversation_id}'
+        )
+        self.assertEqual(bodies, [f'Message {i}' for i in range(25)])
+
+    def test_conversation_history_pages(self):
+        """Test conversation history uses the same cursor pagination."""
+        bodies = self.collect_pages(
+            f'/api/conversations/{self.conversation.conversation_id}/messages/'
+        )
+        self.assertEqual(bodies, [f'Message {i}' for i in range(25)])
+
+    def test_pages_are_stable_when_messages_arrive(self):
+        """Test a new message does not shift the next page."""
+        url = f'/api/messages/?conversation={self.conversation.conversation_id}'
+        first_page = self.client.get(url).data
+        Message.objects.create(
+            sender=self.user,
+            conversation=self.conversation,
+            message_body='New message'
+        )
+        second_page = self.client.get(first_page['next']).data
+        self.assertEqual(
+            second_page['results'][0]['message_body'], 'Message 10'
+        )
+
+
+@override_settings(CONVERSATION_RECENT_MESSAGES=5)
+class ConversationDetailTest(TestCase):
+    """Test conversation detail embeds a bounded message window."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user1 = User.objects.create_user(
+            username='user1',
+            email='user1@example.com',
+            password='testpass123',
+            first_name='User',
+            last_name='One'
+        )
+        self.user2 = User.objects.create_user(
+            username='user2',
+            email='user2@example.com',
+            password='testpass123',
+            first_name='User',
+            last_name='Two'
+        )
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.user1, self.user2)
+        start = timezone.now()
+        Message.objects.bulk_create([
+            Message(
+                sender=self.user1 if i % 2 else self.user2,
+                conversation=self.conversation,
+                message_body=f'Message {i}',
+                sent_at=start - timedelta(minutes=i)
+            )
+            for i in range(12)
+        ])
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user1)
+        self.url = f'/api/conversations/{self.conversation.conversation_id}/'
+
+    def test_recent_window(self):
+        """Test only the most recent messages are embedded."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        bodies = [m['message_body'] for m in response.data['messages']]
+        self.assertEqual(bodies, [f'Message {i}' for i in range(5)])
+
+    def test_senders_side_loaded(self):
+        """Test senders are referenced by id and side-loaded once."""
+        response = self.client.get(self.url)
+        users = response.data['users']
+        self.assertEqual(len(users), 2)
+        for message in response.data['messages']:
+            self.assertIn(str(message['sender']), users)
+
+    def test_next_link_continues_history(self):
+        """Test the next link continues after the embedded window."""
+        response = self.client.get(self.url)
+        bodies = [m['message_body'] for m in response.data['messages']]
+        url = response.data['messages_next']
+        while url:
+            page = self.client.get(url).data
+            bodies.extend(m['message_body'] for m in page['results'])
+            url = page['next']
+        self.assertEqual(bodies, [f'Message {i}' for i in range(12)])
+
+    @override_settings(CHATS_RESPONSE_CACHE_TIMEOUT=0)
+    def test_query_count_independent_of_history(self):
+        """Test retrieving does not issue per-message queries."""
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(self.url)
+        Message.objects.bulk_create([
+            Message(
+                sender=self.user1,
+                conversation=self.conversation,
+                message_body='Older',
+                sent_at=timezone.now() - timedelta(days=1)
+            )
+            for _ in range(20)
+        ])
+        with CaptureQueriesContext(connection) as large:
+            self.client.get(self.url)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+
+class ConversationCreateTest(TestCase):
+    """Test conversation creation with bulk participant inserts."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.users = [
+            User.objects.create(
+                username=f'user{i}',
+                email=f'user{i}@example.com',
+                first_name='User',
+                last_name=str(i)
+            )
+            for i in range(5)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.users[0])
+
+    def create_conversation(self, participant_ids):
+        """Post a new conversation with the given participant ids."""
+        return self.client.post(
+            '/api/conversations/',
+            {'participant_ids': [str(user_id) for user_id in participant_ids]},
+            format='json'
+        )
+
+    def test_create_conversation(self):
+        """Test all participants are added."""
+        response = self.create_conversation(u.user_id for u in self.users)
+        self.assertEqual(response.status_code, 201)
+        conversation = Conversation.objects.get(
+            conversation_id=response.data['conversation_id']
+        )
+        self.assertEqual(conversation.participants.count(), 5)
+
+    def test_query_count_independent_of_participants(self):
+        """Test participants are resolved and inserted in bulk."""
+        with CaptureQueriesContext(connection) as small:
+            self.create_conversation(u.user_id for u in self.users[:2])
+        with CaptureQueriesContext(connection) as large:
+            self.create_conversation(u.user_id for u in self.users)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_invalid_participant(self):
+        """Test unknown ids are rejected without creating anything."""
+        missing_id = uuid.uuid4()
+        response = self.create_conversation([self.users[0].user_id, missing_id])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(missing_id), str(response.data['participant_ids']))
+        self.assertFalse(Conversation.objects.exists())
+
+    def test_duplicate_participants(self):
+        """Test duplicate ids do not count as separate participants."""
+        response = self.create_conversation([self.users[0].user_id] * 2)
+        self.assertEqual(response.status_code, 400)
+
+
+class MessageBulkTest(TestCase):
+    """Test the bulk message ingest endpoint."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create(
+            username='sender',
+            email='sender@example.com',
+            first_name='Sender',
+            last_name='User'
+        )
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.user)
+        self.other_conversation = Conversation.objects.create()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = '/api/messages/bulk/'
+
+    def test_bulk_create_json(self):
+        """Test a JSON list is inserted with one result per item."""
+        items = [
+            {
+                'conversation': str(self.conversation.conversation_id),
+                'message_body': f'Message {i}'
+            }
+            for i in range(30)
+        ]
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(self.url, items, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['results']), 30)
+        self.assertEqual(Message.objects.count(), 30)
+        self.assertLess(len(context.captured_queries), 10)
+
+    def test_bulk_create_ndjson(self):
+        """Test an NDJSON stream is accepted."""
+        body = '\n'.join(
+            json.dumps({
+                'conversation': str(self.conversation.conversation_id),
+                'message_body': f'Message {i}'
+            })
+            for i in range(3)
+        )
+        response = self.client.post(
+            self.url, body, content_type='application/x-ndjson'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Message.objects.count(), 3)
+
+    def test_bulk_create_partial(self):
+        """Test invalid items are reported without blocking valid ones."""
+        items = [
+            {
+                'conversation': str(self.conversation.conversation_id),
+                'message_body': 'Valid'
+            },
+            {
+                'conversation': str(self.conversation.conversation_id),
+                'message_body': '   '
+            },
+            {
+                'conversation': str(self.other_conversation.conversation_id),
+                'message_body': 'Not a member'
+            },
+        ]
+        response = self.client.post(self.url, items, format='json')
+        self.assertEqual(response.status_code, 207)
+        statuses = [result['status'] for result in response.data['results']]
+        self.assertEqual(statuses, [201, 400, 403])
+        self.assertEqual(Message.objects.count(), 1)
+
+    def test_bulk_requires_list(self):
+        """Test a single object is rejected."""
+        response = self.client.post(self.url, {'message_body': 'x'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class MessageSearchTest(TestCase):
+    """Test full-text search over message bodies."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create(
+            username='searcher',
+            email='searcher@example.com',
+            first_name='Search',
+            last_name='User'
+        )
+        self.other = User.objects.create(
+            username='other',
+            email='other@example.com',
+            first_name='Other',
+            last_name='User'
+        )
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.user)
+        self.other_conversation = Conversation.objects.create()
+        self.other_conversation.participants.add(self.other)
+        Message.objects.bulk_create([
+            Message(
+                sender=self.user,
+                conversation=self.conversation,
+                message_body=body
+            )
+            for body in (
+                'Lunch at noon?',
+                'Lunch lunch lunch, I am hungry',
+                'Meeting moved to Friday',
+            )
+        ])
+        Message.objects.create(
+            sender=self.other,
+            conversation=self.other_conversation,
+            message_body='Private lunch plans'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def search(self, query):
+        """Return message bodies from the ranked search endpoint."""
+        response = self.client.get('/api/messages/search/', {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [m['message_body'] for m in response.data['results']]
+
+    def test_ranked_search(self):
+        """Test matches are ranked and scoped to the user's conversations."""
+        self.assertEqual(self.search('lunch'), [
+            'Lunch lunch lunch, I am hungry',
+            'Lunch at noon?',
+        ])
+
+    def test_index_follows_updates_and_deletes(self):
+        """Test the index tracks updated and deleted messages."""
+        message = Message.objects.get(message_body='Meeting moved to Friday')
+        message.message_body = 'Meeting moved to Monday'
+        message.save()
+        self.assertEqual(self.search('friday'), [])
+        self.assertEqual(self.search('monday'), ['Meeting moved to Monday'])
+        message.delete()
+        self.assertEqual(self.search('monday'), [])
+
+    def test_query_syntax_is_escaped(self):
+        """Test FTS query operators in user input are treated as text."""
+        self.assertEqual(self.search('"lunch OR NEAR('), [])
+
+    def test_list_search_filter(self):
+        """Test the list search parameter uses the index."""
+        response = self.client.get(
+            '/api/messages/',
+            {'conversation': str(self.conversation.conversation_id), 'search': 'friday'}
+        )
+        bodies = [m['message_body'] for m in response.data['results']]
+        self.assertEqual(bodies, ['Meeting moved to Friday'])
+
+
+class RealtimeDeliveryTest(TestCase):
+    """Test messages are pushed to websocket subscribers."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user1 = User.objects.create(
+            username='user1',
+            email='user1@example.com',
+            first_name='User',
+            last_name='One'
+        )
+        self.user2 = User.objects.create(
+            username='user2',
+            email='user2@example.com',
+            first_name='User',
+            last_name='Two'
+        )
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.user1, self.user2)
+        self.client = APIClient()
+
+    def websocket_scope(self, user):
+        """Return a websocket scope carrying the user's session cookie."""
+        self.client.force_login(user)
+        cookie = self.client.cookies[settings.SESSION_COOKIE_NAME]
+        return {
+            'type': 'websocket',
+            'path': WEBSOCKET_PATH,
+            'headers': [
+                (b'cookie', f'{cookie.key}={cookie.value}'.encode()),
+                (b'origin', b'http://testserver'),
+            ],
+        }
+
+    async def connect(self, scope):
+        """Open a websocket and return the application's first reply."""
+        communicator = ApplicationCommunicator(websocket_application, scope)
+        await communicator.send_input({'type': 'websocket.connect'})
+        return await communicator.receive_output(timeout=5)
+
+    def send_message(self, body):
+        """Send a message through the API as user2."""
+        self.client.force_authenticate(user=self.user2)
+        url = f'/api/conversations/{self.conversation.conversation_id}/send_message/'
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {'message_body': body}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_message_pushed_to_participant(self):
+        """Test a sent message is delivered to a connected participant."""
+        scope = self.websocket_scope(self.user1)
+
+        async def stream():
+            communicator = ApplicationCommunicator(websocket_application, scope)
+            await communicator.send_input({'type': 'websocket.connect'})
+            accepted = await communicator.receive_output(timeout=5)
+            await sync_to_async(self.send_message)('Hello there')
+            pushed = await communicator.receive_output(timeout=5)
+            await communicator.send_input({'type': 'websocket.disconnect'})
+            await communicator.wait(timeout=5)
+            return accepted, pushed
+
+        accepted, pushed = async_to_sync(stream)()
+        self.assertEqual(accepted['type'], 'websocket.accept')
+        self.assertEqual(pushed['type'], 'websocket.send')
+        payload = json.loads(pushed['text'])
+        self.assertEqual(payload['message_body'], 'Hello there')
+        self.assertEqual(
+            payload['conversation'], str(self.conversation.conversation_id)
+        )
+
+    def test_anonymous_connection_rejected(self):
+        """Test a websocket without a session is closed."""
+        scope = {
+            'type': 'websocket',
+            'path': WEBSOCKET_PATH,
+            'headers': [(b'origin', b'http://testserver')],
+        }
+        closed = async_to_sync(self.connect)(scope)
+        self.assertEqual(closed, {'type': 'websocket.close', 'code': 4401})
+
+    def test_foreign_origin_rejected(self):
+        """Test a handshake from another site is closed before accepting."""
+        scope = self.websocket_scope(self.user1)
+        scope['headers'][1] = (b'origin', b'https://evil.example.com')
+        closed = async_to_sync(self.connect)(scope)
+        self.assertEqual(closed, {'type': 'websocket.close', 'code': 4403})
+        del scope['headers'][1]
+        closed = async_to_sync(self.connect)(scope)
+        self.assertEqual(closed, {'type': 'websocket.close', 'code': 4403})
+
+    def test_unsubscribed_messages_not_serialized(self):
+        """Test nothing is rendered for conversations nobody listens to."""
+        with mock.patch('chats.serializers.serialize_message_rows') as serialize:
+            self.send_message('Nobody is listening')
+        serialize.assert_not_called()
+
+
+class ConversationResponseCacheTest(TestCase):
+    """Test cached conversation responses and their invalidation."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user1 = User.objects.create(
+            username='user1',
+            email='user1@example.com',
+            first_name='User',
+            last_name='One'
+        )
+        self.user2 = User.objects.create(
+            username='user2',
+            email='user2@example.com',
+            first_name='User',
+            last_name='Two'
+        )
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.user1, self.user2)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user1)
+        self.detail_url = f'/api/conversations/{self.conversation.conversation_id}/'
+
+    def test_list_served_from_cache(self):
+        """Test an unchanged inbox is served without database queries."""
+        first = self.client.get('/api/conversations/')
+        with CaptureQueriesContext(connection) as context:
+            second = self.client.get('/api/conversations/')
+        self.assertEqual(len(context.captured_queries), 0)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_new_message_invalidates(self):
+        """Test a new message invalidates the list and detail responses."""
+        list_etag = self.client.get('/api/conversations/')['ETag']
+        detail_etag = self.client.get(self.detail_url)['ETag']
+        Message.objects.create(
+            sender=self.user2,
+            conversation=self.conversation,
+            message_body='Hello'
+        )
+        response = self.client.get('/api/conversations/')
+        self.assertNotEqual(response['ETag'], list_etag)
+        self.assertEqual(
+            response.data['results'][0]['last_message']['message_body'], 'Hello'
+        )
+        response = self.client.get(self.detail_url)
+        self.assertNotEqual(response['ETag'], detail_etag)
+        self.assertEqual(len(response.data['messages']), 1)
+
+    def test_conversation_delete_invalidates_once(self):
+        """Test deleting a conversation invalidates it once, not per message."""
+        Message.objects.bulk_create([
+            Message(
+                sender=self.user2,
+                conversation=self.conversation,
+                message_body=f'Message {i}'
+            )
+            for i in range(20)
+        ])
+        self.assertEqual(self.client.get('/api/conversations/').data['count'], 1)
+        with mock.patch(
+            'chats.signals.invalidate_conversations',
+            wraps=invalidate_conversations
+        ) as invalidate:
+            response = self.client.delete(self.detail_url)
+        self.assertEqual(response.status_code, 204)
+        invalidate.assert_called_once_with([self.conversation.conversation_id])
+        self.assertEqual(self.client.get('/api/conversations/').data['count'], 0)
+
+    def test_participant_change_invalidates(self):
+        """Test joining a conversation invalidates the user's inbox."""
+        self.client.get('/api/conversations/')
+        other = Conversation.objects.create()
+        other.participants.add(self.user1)
+        response = self.client.get('/api/conversations/')
+        self.assertEqual(response.data['count'], 2)
+
+    def test_not_modified(self):
+        """Test a matching If-None-Match gets 304 Not Modified."""
+        etag = self.client.get(self.detail_url)['ETag']
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        Message.objects.create(
+            sender=self.user2,
+            conversation=self.conversation,
+            message_body='Hello'
+        )
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_cache_keyed_per_user(self):
+        """Test users never see each other's cached inbox."""
+        self.client.get('/api/conversations/')
+        self.client.force_authenticate(user=self.user2)
+        Message.objects.bulk_create([Message(
+            sender=self.user1,
+            conversation=self.conversation,
+            message_body='Unread'
+        )])
+        response = self.client.get('/api/conversations/')
+        self.assertEqual(response.data['results'][0]['unread_count'], 1)
+
+
+class ConversationActivityTest(TestCase):
+    """Test denormalized last message and activity ordering."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create(
+            username='user1',
+            email='user1@example.com',
+            first_name='User',
+            last_name='One'
+        )
+        self.older = Conversation.objects.create()
+        self.newer = Conversation.objects.create()
+        for conversation in (self.older, self.newer):
+            conversation.participants.add(self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def send(self, conversation, body):
+        """Send a message through the API."""
+        url = f'/api/conversations/{conversation.conversation_id}/send_message/'
+        response = self.client.post(url, {'message_body': body}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data
+
+    def test_inbox_ordered_by_activity(self):
+        """Test the conversation with the latest message comes first."""
+        self.send(self.older, 'Bump')
+        response = self.client.get('/api/conversations/')
+        ids = [c['conversation_id'] for c in response.data['results']]
+        self.assertEqual(ids[0], str(self.older.conversation_id))
+        self.assertEqual(
+            response.data['results'][0]['last_message']['message_body'], 'Bump'
+        )
+
+    def test_last_message_maintained(self):
+        """Test new and deleted messages keep the last message current."""
+        first = self.send(self.older, 'First')
+        second = self.send(self.older, 'Second')
+        self.older.refresh_from_db()
+        self.assertEqual(str(self.older.last_message_id), str(second['message_id']))
+        Message.objects.get(message_id=second['message_id']).delete()
+        self.older.refresh_from_db()
+        self.assertEqual(str(self.older.last_message_id), str(first['message_id']))
+
+    def test_conversation_delete_query_count(self):
+        """Test deleting a conversation does not run queries per message."""
+        Message.objects.bulk_create([
+            Message(
+                sender=self.user,
+                conversation=self.older,
+                message_body=f'Message {i}'
+            )
+            for i in range(100)
+        ])
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.delete(
+                f'/api/conversations/{self.older.conversation_id}/'
+            )
+        self.assertEqual(response.status_code, 204)
+        self.assertLess(len(context.captured_queries), 20)
+        self.assertFalse(
+            Message.objects.filter(conversation=self.older).exists()
+        )
+
+    def test_older_message_does_not_replace_newer(self):
+        """Test a message with an earlier timestamp leaves activity alone."""
+        latest = Message.objects.create(
+            sender=self.user, conversation=self.older, message_body='Latest'
+        )
+        Message.objects.create(
+            sender=self.user,
+            conversation=self.older,
+            message_body='Replayed',
+            sent_at=latest.sent_at - timedelta(hours=1)
+        )
+        self.older.refresh_from_db()
+        self.assertEqual(self.older.last_message_id, latest.message_id)
+
+    def test_backfill_command(self):
+        """Test the backfill command sets last messages in batches."""
+        messages = Message.objects.bulk_create([
+            Message(
+                sender=self.user,
+                conversation=conversation,
+                message_body='Imported',
+                sent_at=timezone.now() + timedelta(minutes=i)
+            )
+            for i, conversation in enumerate((self.older, self.newer))
+        ])
+        Conversation.objects.update(last_message=None)
+        call_command('backfill_last_message', batch_size=1, stdout=StringIO())
+        for conversation, message in zip((self.older, self.newer), messages):
+            conversation.refresh_from_db()
+            self.assertEqual(conversation.last_message_id, message.message_id)
+            self.assertEqual(conversation.last_activity_at, message.sent_at)
+
+
+class ConversationScopingTest(TestCase):
+    """Test list endpoints are scoped to the user's conversations."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create(
+            username='member', email='member@example.com'
+        )
+        self.other = User.objects.create(
+            username='other', email='other@example.com'
+        )
+        self.own = Conversation.objects.create()
+        self.own.participants.add(self.user, self.other)
+        self.foreign = Conversation.objects.create()
+        self.foreign.participants.add(self.other)
+        for conversation in (self.own, self.foreign):
+            Message.objects.create(
+                sender=self.other,
+                conversation=conversation,
+                message_body='Hello'
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def capture_query(self, url, table):
+        """Return the SQL of the request's query selecting from ``table``."""
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        prefix = f'SELECT "{table}".'
+        return next(
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith(prefix)
+        )
+
+    def query_plan(self, sql):
+        """Return the SQLite query plan of ``sql`` as one string."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return '\n'.join(row[-1] for row in cursor.fetchall())
+
+    def test_conversation_list_is_scoped(self):
+        """Test only conversations the user takes part in are listed."""
+        response = self.client.get('/api/conversations/')
+        ids = [c['conversation_id'] for c in response.data['results']]
+        self.assertEqual(ids, [str(self.own.conversation_id)])
+
+    def test_foreign_conversation_is_hidden(self):
+        """Test other conversations are not found."""
+        response = self.client.get(
+            f'/api/conversations/{self.foreign.conversation_id}/'
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_message_list_is_scoped(self):
+        """Test messages from other conversations are not listed."""
+        response = self.client.get('/api/messages/')
+        self.assertEqual(len(response.data['results']), 1)
+        response = self.client.get(
+            f'/api/messages/?conversation={self.foreign.conversation_id}'
+        )
+        self.assertEqual(response.data['results'], [])
+
+    def test_conversation_list_plan(self):
+        """Test the list is driven by the participant index without DISTINCT."""
+        if connection.vendor != 'sqlite':
+            self.skipTest('Query plan assertions target SQLite.')
+        sql = self.capture_query('/api/conversations/', 'conversation')
+        self.assertNotIn('DISTINCT', sql)
+        plan = self.query_plan(sql)
+        self.assertIn('participant_conversation_idx', plan)
+        self.assertNotIn('DISTINCT', plan)
+
+    def test_message_list_plan(self):
+        """Test membership is checked with an indexed lookup."""
+        if connection.vendor != 'sqlite':
+            self.skipTest('Query plan assertions target SQLite.')
+        sql = self.capture_query(
+            f'/api/messages/?conversation={self.own.conversation_id}',
+            'message'
+        )
+        self.assertIn('EXISTS', sql)
+        plan = self.query_plan(sql)
+        self.assertRegex(
+            plan, r'SEARCH \w+ USING COVERING INDEX conversation_participant'
+        )
+        self.assertNotRegex(plan, r'SCAN (U0|conversation_participant)')
+        self.assertNotIn('DISTINCT', plan)
+
+
+class UserSummaryTest(TestCase):
+    """Test nested users are rendered as cached summaries."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create(
+            username='summary',
+            email='summary@example.com',
+            first_name='Sum',
+            last_name='Mary',
+            role='host'
+        )
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.user)
+        Message.objects.bulk_create([
+            Message(
+                sender=self.user,
+                conversation=self.conversation,
+                message_body=f'Message {i}'
+            )
+            for i in range(3)
+        ])
+
+    def test_summary_fields(self):
+        """Test a nested sender only exposes id, name and role."""
+        message = Message.objects.select_related('sender').first()
+        self.assertEqual(MessageSerializer(message).data['sender'], {
+            'user_id': str(self.user.user_id),
+            'name': 'Sum Mary',
+            'role': 'host'
+        })
+
+    def test_sender_summarized_once(self):
+        """Test a repeated sender is summarized once per response."""
+        serializer = MessageSerializer(
+            Message.objects.select_related('sender'), many=True
+        )
+        senders = [message['sender'] for message in serializer.data]
+        self.assertEqual(len(senders), 3)
+        self.assertTrue(all(sender is senders[0] for sender in senders))
+        self.assertEqual(list(serializer.context['user_summaries']), [
+            self.user.user_id
+        ])
+
+
+class MessageValuesSerializerTest(TestCase):
+    """Test the read-optimized message serializer matches the model one."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.users = [
+            User.objects.create(
+                username='first', email='first@example.com',
+                first_name='First', last_name='Sender'
+            ),
+            User.objects.create(
+                username='second', email='second@example.com',
+                first_name='Second', last_name='', role='admin'
+            ),
+        ]
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(*self.users)
+        start = timezone.now()
+        Message.objects.bulk_create([
+            Message(
+                sender=self.users[i % 2],
+                conversation=self.conversation,
+                message_body=f'Message {i} \u00e9 "quoted"',
+                sent_at=start - timedelta(minutes=i, microseconds=i)
+            )
+            for i in range(6)
+        ])
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.users[0])
+
+    def render_both(self):
+        """Render all messages through both serializers."""
+        ordering = ('-sent_at', '-message_id')
+        instances = Message.objects.select_related('sender').order_by(*ordering)
+        rows = Message.objects.order_by(*ordering).values(
+            *MessageValuesSerializer.values_fields
+        )
+        renderer = JSONRenderer()
+        return (
+            renderer.render(MessageSerializer(instances, many=True).data),
+            renderer.render(MessageValuesSerializer(rows, many=True).data)
+        )
+
+    def test_byte_identical_json(self):
+        """Test both serializers render the same bytes."""
+        expected, actual = self.render_both()
+        self.assertEqual(actual, expected)
+
+    @override_settings(TIME_ZONE='America/New_York')
+    def test_byte_identical_json_in_local_time(self):
+        """Test datetimes are converted to the current time zone alike."""
+        expected, actual = self.render_both()
+        self.assertEqual(actual, expected)
+
+    def test_single_row(self):
+        """Test a single row matches the model serializer."""
+        message = Message.objects.select_related('sender').first()
+        row = Message.objects.filter(pk=message.pk).values(
+            *MessageValuesSerializer.values_fields
+        ).get()
+        self.assertEqual(
+            MessageValuesSerializer(row).data,
+            json.loads(JSONRenderer().render(MessageSerializer(message).data))
+        )
+
+    def test_list_endpoints_use_rows(self):
+        """Test both message listings serve the read-optimized output."""
+        expected, _ = self.render_both()
+        for url in (
+            '/api/messages/',
+            f'/api/conversations/{self.conversation.conversation_id}/messages/'
+        ):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                JSONRenderer().render(response.data['results']), expected
+            )
+
+
+class ChatsJSONRendererTest(TestCase):
+    """Test the fast JSON renderer matches DRF's JSONRenderer."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.data = {
+            'id': uuid.uuid4(),
+            'utc': datetime(2024, 5, 1, 12, 30, 15, 123456, dt_timezone.utc),
+            'offset': datetime(
+                2024, 5, 1, 12, 30, tzinfo=dt_timezone(timedelta(hours=2))
+            ),
+            'day': date(2024, 5, 1),
+            'amount': Decimal('1.50'),
+            'label': gettext_lazy('Message'),
+            'text': 'caf\u00e9 \u2028 "quoted"',
+            'results': [{'n': i, 'empty': None} for i in range(5)],
+        }
+
+    def test_matches_json_renderer(self):
+        """Test compact and indented output equal DRF's."""
+        for context in ({}, {'indent': 4}):
+            self.assertEqual(
+                ChatsJSONRenderer().render(self.data, None, context),
+                JSONRenderer().render(self.data, None, context)
+            )
+
+    def test_stdlib_fallback(self):
+        """Test output is unchanged without orjson installed."""
+        expected = JSONRenderer().render(self.data)
+        with mock.patch('chats.renderers.orjson', None):
+            self.assertEqual(ChatsJSONRenderer().render(self.data), expected)
+
+    def test_ascii_only_matches_json_renderer(self):
+        """Test ASCII-only output equals DRF's."""
+        renderer, expected = ChatsJSONRenderer(), JSONRenderer()
+        renderer.ensure_ascii = expected.ensure_ascii = True
+        self.assertEqual(renderer.render(self.data), expected.render(self.data))
+
+    def test_large_integer_falls_back(self):
+        """Test integers orjson rejects are rendered by the stdlib."""
+        data = {'count': 2 ** 70}
+        self.assertEqual(
+            ChatsJSONRenderer().render(data), JSONRenderer().render(data)
+        )
+
+    def test_list_field_errors_rendered(self):
+        """Test errors keyed by list index render as a 400."""
+        user = User.objects.create(username='lister', email='lister@example.com')
+        client = APIClient()
+        client.force_authenticate(user=user)
+        response = client.post(
+            '/api/conversations/',
+            {'participant_ids': ['nope', str(user.user_id)]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            json.loads(response.content)['participant_ids'],
+            {'0': ['Must be a valid UUID.']}
+        )
+
+    def test_iter_render(self):
+        """Test the streamed chunks join to the rendered document."""
+        renderer = ChatsJSONRenderer()
+        renderer.stream_chunk_size = 2
+        chunks = list(renderer.iter_render(self.data))
+        self.assertGreater(len(chunks), 3)
+        self.assertEqual(b''.join(chunks), JSONRenderer().render(self.data))
+        self.assertEqual(
+            b''.join(renderer.iter_render({'results': []})), b'{"results":[]}'
+        )
+
+    def test_parser(self):
+        """Test the parser decodes JSON and reports malformed bodies."""
+        parser = ChatsJSONParser()
+        self.assertEqual(
+            parser.parse(BytesIO(b'{"message_body": "caf\xc3\xa9"}')),
+            {'message_body': 'caf\u00e9'}
+        )
+        with self.assertRaises(ParseError):
+            parser.parse(BytesIO(b'{"message_body": '))
+
+
+class StreamingResponseTest(TestCase):
+    """Test large message lists are streamed."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create(
+            username='streamer', email='streamer@example.com'
+        )
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.user)
+        Message.objects.bulk_create([
+            Message(
+                sender=self.user,
+                conversation=self.conversation,
+                message_body=f'Message {i}'
+            )
+            for i in range(5)
+        ])
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_streamed_list_matches_buffered(self):
+        """Test a streamed page has the same body as a buffered one."""
+        for url in (
+            '/api/messages/',
+            f'/api/conversations/{self.conversation.conversation_id}/messages/'
+        ):
+            with override_settings(CHATS_STREAMING_MIN_ITEMS=0):
+                buffered = self.client.get(url)
+            with override_settings(CHATS_STREAMING_MIN_ITEMS=5):
+                streamed = self.client.get(url)
+            self.assertFalse(buffered.streaming)
+            self.assertTrue(streamed.streaming)
+            self.assertEqual(streamed['Content-Type'], 'application/json')
+            self.assertEqual(
+                b''.join(streamed.streaming_content), buffered.content
+            )
+
+    @override_settings(CHATS_STREAMING_MIN_ITEMS=6)
+    def test_small_list_is_buffered(self):
+        """Test lists below the threshold are rendered as usual."""
+        response = self.client.get('/api/messages/')
+        self.assertFalse(response.streaming)
+        self.assertEqual(len(response.json()['results']), 5)
+
+
+@override_settings(CHATS_RESPONSE_CACHE_TIMEOUT=0)
+class PerformanceMiddlewareTest(TestCase):
+    """Test per-request performance instrumentation."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create(
+            username='measured', email='measured@example.com'
+        )
+        self.other = User.objects.create(
+            username='peer', email='peer@example.com'
+        )
+        for _ in range(3):
+            conversation = Conversation.objects.create()
+            conversation.participants.add(self.user, self.other)
+            for sender in (self.user, self.other):
+                Message.objects.create(
+                    sender=sender,
+                    conversation=conversation,
+                    message_body='Hello'
+                )
+        self.conversation = conversation
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        registry.clear()
+
+    def test_server_timing_header(self):
+        """Test the header reports the queries the request ran."""
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/conversations/')
+        timing = response['Server-Timing']
+        self.assertIn(f'desc="{len(context.captured_queries)} queries"', timing)
+        for name in ('db', 'serialize', 'render', 'total'):
+            self.assertRegex(timing, rf'\b{name};dur=\d+\.\d+')
+
+    def test_log_line(self):
+        """Test each request is logged as one JSON line."""
+        with self.assertLogs('chats.performance', 'INFO') as logs:
+            self.client.get('/api/messages/')
+        entry = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(entry['view'], 'MessageViewSet.list')
+        self.assertEqual(entry['status'], 200)
+        self.assertGreater(entry['queries'], 0)
+        self.assertGreater(entry['serialize_ms'], 0)
+
+    def test_metrics_endpoint(self):
+        """Test histograms are aggregated per view and action."""
+        for _ in range(2):
+            self.client.get('/api/conversations/')
+        self.client.get(
+            f'/api/conversations/{self.conversation.conversation_id}/messages/'
+        )
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        metrics = self.client.get('/api/metrics/').json()
+        conversations = metrics['ConversationViewSet.list']
+        self.assertEqual(conversations['total_ms']['count'], 2)
+        self.assertEqual(conversations['queries']['buckets']['+Inf'], 2)
+        self.assertEqual(
+            metrics['ConversationViewSet.messages']['db_ms']['count'], 1
+        )
+
+    @override_settings(CHATS_QUERY_BUDGETS={'ConversationViewSet.list': 1})
+    def test_query_budget_exceeded(self):
+        """Test a request over its query budget fails."""
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get('/api/conversations/')
+
+    @override_settings(CHATS_QUERY_BUDGETS={
+        'ConversationViewSet.list': 3,
+        'ConversationViewSet.retrieve': 3,
+        'ConversationViewSet.messages': 2,
+        'MessageViewSet.list': 1,
+        'MessageViewSet.ranked_search': 1,
+    })
+    def test_endpoint_query_budgets(self):
+        """Test read endpoints stay within their query budgets."""
+        conversation_url = (
+            f'/api/conversations/{self.conversation.conversation_id}/'
+        )
+        for url in (
+            '/api/conversations/',
+            conversation_url,
+            conversation_url + 'messages/',
+            '/api/messages/',
+            '/api/messages/search/?search=hello',
+        ):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class SeedDataCommandTest(TestCase):
+    """Test the synthetic data generator."""
+
+    def test_seed_data(self):
+        """Test the requested volumes are created consistently."""
+        call_command(
+            'seed_data', users=20, conversations=30, messages=500,
+            batch_size=64, stdout=StringIO()
+        )
+        self.assertEqual(User.objects.filter(email__startswith='seed').count(), 20)
+        self.assertEqual(Conversation.objects.count(), 30)
+        self.assertEqual(Message.objects.count(), 500)
+        self.assertTrue(
+            User.objects.get(email='seed0@example.com').check_password('password')
+        )
+        for conversation in Conversation.objects.prefetch_related('participants'):
+            participant_ids = {
+                user.user_id for user in conversation.participants.all()
+            }
+            self.assertGreaterEqual(len(participant_ids), 2)
+            latest = conversation.messages.order_by('-sent_at').first()
+            if latest is None:
+                self.assertIsNone(conversation.last_message_id)
+                continue
+            self.assertEqual(conversation.last_message_id, latest.message_id)
+            self.assertIn(latest.sender_id, participant_ids)
+            self.assertLessEqual(latest.sent_at, timezone.now())
+
+
+@override_settings(
+    CHATS_DATABASE_REPLICAS=['replica'], CHATS_RESPONSE_CACHE_TIMEOUT=0
+)
+class ReplicaRoutingTest(TestCase):
+    """Test safe-method requests read from the replica database."""
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        """Set up test data on the primary, replicated by hand."""
+        self.user = User.objects.create(
+            username='reader', email='reader@example.com'
+        )
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def replicate(self):
+        """Copy the primary's rows to the replica."""
+        for model in (User, Conversation, ConversationParticipant, Message):
+            model.objects.using('replica').bulk_create(
+                model.objects.using('default').all()
+            )
+
+    def history(self):
+        """Return message bodies of the conversation history."""
+        response = self.client.get(
+            f'/api/conversations/{self.conversation.conversation_id}/messages/'
+        )
+        self.assertEqual(response.status_code, 200)
+        return [message['message_body'] for message in response.data['results']]
+
+    def test_reads_use_replica(self):
+        """Test lists only see rows once they reach the replica."""
+        self.assertEqual(self.client.get('/api/conversations/').data['results'], [])
+        self.replicate()
+        results = self.client.get('/api/conversations/').data['results']
+        self.assertEqual(len(results), 1)
+
+    def test_read_your_writes(self):
+        """Test a client that sent a message reads it from the primary."""
+        self.replicate()
+        url = (
+            f'/api/conversations/{self.conversation.conversation_id}'
+            '/send_message/'
+        )
+        response = self.client.post(url, {'message_body': 'Hi'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('chats_pin_primary', response.cookies)
+        self.assertEqual(self.history(), ['Hi'])
+        del self.client.cookies['chats_pin_primary']
+        self.assertEqual(self.history(), [])
+
+    def test_unhealthy_replica_falls_back_to_primary(self):
+        """Test reads go to the primary when the replica is down."""
+        for replica_router in router.routers:
+            if isinstance(replica_router, ReplicaRouter):
+                self.addCleanup(replica_router.reset)
+        with mock.patch.object(
+            connections['replica'], 'ensure_connection',
+            side_effect=OperationalError('replica down')
+        ):
+            results = self.client.get('/api/conversations/').data['results']
+        self.assertEqual(len(results), 1)
+
+    def test_one_replica_per_block(self):
+        """Test every read in a block uses the replica picked at its start."""
+        picks = iter(['replica', 'default'])
+        with mock.patch.object(
+            ReplicaRouter, 'pick_replica', side_effect=lambda: next(picks)
+        ):
+            with replica_reads():
+                aliases = {
+                    router.db_for_read(model)
+                    for model in (Conversation, Message, Conversation)
+                }
+        self.assertEqual(aliases, {'replica'})
+
+    def test_round_robin(self):
+        """Test healthy replicas are taken in turn, skipping failed ones."""
+        router = ReplicaRouter()
+        healthy = {'a': True, 'b': True, 'c': True}
+        router.check_health = lambda alias: healthy[alias]
+        with override_settings(CHATS_DATABASE_REPLICAS=['a', 'b', 'c']):
+            self.assertEqual(
+                [router.pick_replica() for _ in range(4)], ['a', 'b', 'c', 'a']
+            )
+            healthy['b'] = False
+            self.assertEqual(
+                [router.pick_replica() for _ in range(3)], ['c', 'c', 'a']
+            )
+            self.assertTrue(router.is_down('b'))
+
+
+@override_settings(
+    CHATS_MESSAGE_SHARDS=['messages_0', 'messages_1'],
+    CHATS_RESPONSE_CACHE_TIMEOUT=0
+)
+class MessageShardingTest(TestCase):
+    """Test messages are spread across shards by conversation."""
+    databases = {'default', 'messages_0', 'messages_1'}
+
+    def setUp(self):
+        """Set up one conversation on each shard."""
+        self.user = User.objects.create(
+            username='sharded', email='sharded@example.com', first_name='Ann'
+        )
+        self.other = User.objects.create(
+            username='other', email='other@example.com', first_name='Bob'
+        )
+        self.conversations = {}
+        for shard in ('messages_0', 'messages_1'):
+            conversation_id = uuid.uuid4()
+            while shard_for(conversation_id) != shard:
+                conversation_id = uuid.uuid4()
+            conversation = Conversation.objects.create(
+                conversation_id=conversation_id
+            )
+            conversation.participants.add(self.user, self.other)
+            self.conversations[shard] = conversation
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def add_message(self, shard, body, minutes_ago, sender=None):
+        """Create a message in the shard's conversation."""
+        return Message.objects.create(
+            conversation=self.conversations[shard],
+            sender=sender or self.other,
+            message_body=body,
+            sent_at=timezone.now() - timedelta(minutes=minutes_ago)
+        )
+
+    def test_messages_stored_on_shard(self):
+        """Test sent messages land on their conversation's shard."""
+        conversation = self.conversations['messages_1']
+        response = self.client.post(
+            f'/api/conversations/{conversation.conversation_id}/send_message/',
+            {'message_body': 'Hi'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Message.objects.using('messages_1').count(), 1)
+        self.assertEqual(Message.objects.using('messages_0').count(), 0)
+        self.assertEqual(Message.objects.using('default').count(), 0)
+        response = self.client.get(
+            f'/api/conversations/{conversation.conversation_id}/messages/'
+        )
+        self.assertEqual(
+            [(m['message_body'], m['sender']['name']) for m in response.data['results']],
+            [('Hi', 'Ann')]
+        )
+
+    def test_message_list_merges_shards(self):
+        """Test listing messages pages through every shard in order."""
+        for minutes_ago in range(6):
+            shard = f'messages_{minutes_ago % 2}'
+            self.add_message(shard, f'm{minutes_ago}', minutes_ago)
+        response = self.client.get('/api/messages/', {'page_size': 4})
+        self.assertEqual(
+            [m['message_body'] for m in response.data['results']],
+            ['m0', 'm1', 'm2', 'm3']
+        )
+        self.assertEqual(response.data['results'][0]['sender']['name'], 'Bob')
+        response = self.client.get(response.data['next'])
+        self.assertEqual(
+            [m['message_body'] for m in response.data['results']], ['m4', 'm5']
+        )
+        message = self.add_message('messages_1', 'single', 10)
+        response = self.client.get(f'/api/messages/{message.message_id}/')
+        self.assertEqual(response.data['message_body'], 'single')
+
+    def test_unknown_message_not_found(self):
+        """Test an id on no shard is a 404."""
+        response = self.client.get(f'/api/messages/{uuid.uuid4()}/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_search_across_shards(self):
+        """Test ranked search merges matches from every shard."""
+        self.add_message('messages_0', 'lunch plans', 2)
+        self.add_message('messages_1', 'lunch today', 1)
+        self.add_message('messages_1', 'unrelated', 0)
+        response = self.client.get('/api/messages/search/', {'search': 'lunch'})
+        self.assertEqual(
+            sorted(m['message_body'] for m in response.data['results']),
+            ['lunch plans', 'lunch today']
+        )
+
+    def test_conversation_list(self):
+        """Test last messages and unread counts are read from the shards."""
+        ConversationParticipant.objects.update(
+            joined_at=timezone.now() - timedelta(hours=1)
+        )
+        self.add_message('messages_0', 'old', 5)
+        self.add_message('messages_0', 'new', 1)
+        self.add_message('messages_1', 'mine', 3, sender=self.user)
+        with CaptureQueriesContext(connections['messages_0']) as queries:
+            results = self.client.get('/api/conversations/').data['results']
+        self.assertLessEqual(len(queries), 2)
+        summary = {
+            result['last_message']['message_body']: result['unread_count']
+            for result in results
+        }
+        self.assertEqual(summary, {'new': 2, 'mine': 0})
+
+    def test_delete_falls_back_to_previous_message(self):
+        """Test deleting the last message restores the one before it."""
+        previous = self.add_message('messages_0', 'previous', 5, sender=self.user)
+        last = self.add_message('messages_0', 'last', 1, sender=self.user)
+        response = self.client.delete(f'/api/messages/{last.message_id}/')
+        self.assertEqual(response.status_code, 204)
+        conversation = self.conversations['messages_0']
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.last_message_id, previous.message_id)
+
+    def test_conversation_delete_clears_shard(self):
+        """Test deleting a conversation deletes its messages on the shard."""
+        conversation = self.conversations['messages_0']
+        self.add_message('messages_0', 'hot', 1)
+        ArchivedMessage.objects.using('messages_0').create(
+            conversation=conversation,
+            sender=self.other,
+            message_body='archived',
+            sent_at=timezone.now() - timedelta(days=90)
+        )
+        kept = self.add_message('messages_1', 'kept', 1)
+        response = self.client.delete(
+            f'/api/conversations/{conversation.conversation_id}/'
+        )
+        self.assertEqual(response.status_code, 204)
+        for model in (Message, ArchivedMessage):
+            self.assertFalse(model.objects.using('messages_0').exists())
+        self.assertEqual(
+            list(Message.objects.using('messages_1').values_list('pk', flat=True)),
+            [kept.pk]
+        )
+
+    def test_backfill_reads_shards(self):
+        """Test the backfill finds last messages on every shard."""
+        messages = {
+            shard: self.add_message(shard, shard, 1)
+            for shard in self.conversations
+        }
+        Conversation.objects.update(last_message=None)
+        call_command('backfill_last_message', stdout=StringIO())
+        for shard, conversation in self.conversations.items():
+            conversation.refresh_from_db()
+            self.assertEqual(
+                conversation.last_message_id, messages[shard].message_id
+            )
+
+    def test_bulk_create_routes_per_shard(self):
+        """Test bulk-created messages are split between shards."""
+        response = self.client.post(
+            '/api/messages/bulk/',
+            [
+                {'conversation': str(conversation.conversation_id), 'message_body': shard}
+                for shard, conversation in self.conversations.items()
+            ],
+            format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        for shard, conversation in self.conversations.items():
+            self.assertEqual(
+                list(Message.objects.using(shard).values_list(
+                    'message_body', flat=True
+                )),
+                [shard]
+            )
+            conversation.refresh_from_db()
+            self.assertIsNotNone(conversation.last_message_id)
+
+    @override_settings(CHATS_ARCHIVE_AFTER_DAYS=30)
+    def test_archive_on_shards(self):
+        """Test messages are archived on their shard and still listed."""
+        self.add_message('messages_1', 'old', 60 * 24 * 40)
+        self.add_message('messages_1', 'new', 1)
+        call_command('archive_messages', stdout=StringIO())
+        self.assertEqual(
+            list(ArchivedMessage.objects.using('messages_1').values_list(
+                'message_body', flat=True
+            )),
+            ['old']
+        )
+        response = self.client.get('/api/messages/')
+        self.assertEqual(
+            [m['message_body'] for m in response.data['results']],
+            ['new', 'old']
+        )
+
+    def test_rebalance_messages(self):
+        """Test the rebalance command moves misplaced messages."""
+        for model in (Message, ArchivedMessage):
+            model.objects.using('default').bulk_create([
+                model(
+                    conversation=conversation,
+                    sender=self.other,
+                    message_body=shard,
+                    sent_at=timezone.now()
+                )
+                for shard, conversation in self.conversations.items()
+            ])
+        out = StringIO()
+        call_command('rebalance_messages', dry_run=True, stdout=out)
+        self.assertIn('Would move 4 messages.', out.getvalue())
+        self.assertEqual(Message.objects.using('default').count(), 2)
+        call_command('rebalance_messages', stdout=StringIO())
+        for model in (Message, ArchivedMessage):
+            self.assertEqual(model.objects.using('default').count(), 0)
+            for shard in self.conversations:
+                self.assertEqual(
+                    list(model.objects.using(shard).values_list(
+                        'message_body', flat=True
+                    )),
+                    [shard]
+                )
+
+
+@override_settings(CHATS_ARCHIVE_AFTER_DAYS=30, CHATS_RESPONSE_CACHE_TIMEOUT=0)
+class MessageArchiveTest(TestCase):
+    """Test old messages move to the archive and stay readable."""
+
+    def setUp(self):
+        """Set up a conversation with old and recent messages."""
+        self.user = User.objects.create(
+            username='archivist', email='archivist@example.com'
+        )
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.user)
+        now = timezone.now()
+        for days_ago in (60, 50, 40, 3, 2, 1):
+            Message.objects.create(
+                conversation=self.conversation,
+                sender=self.user,
+                message_body=f'{days_ago} days ago',
+                sent_at=now - timedelta(days=days_ago)
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def bodies(self, url, page_size):
+        """Return message bodies of every page of ``url``."""
+        bodies = []
+        response = self.client.get(url, {'page_size': page_size})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            bodies.extend(m['message_body'] for m in response.data['results'])
+            if not response.data['next']:
+                return bodies
+            response = self.client.get(response.data['next'])
+
+    def test_archive_messages(self):
+        """Test only messages past the threshold are archived."""
+        out = StringIO()
+        call_command('archive_messages', dry_run=True, stdout=out)
+        self.assertIn('Would archive 3 messages', out.getvalue())
+        self.assertEqual(ArchivedMessage.objects.count(), 0)
+        call_command('archive_messages', batch_size=2, stdout=StringIO())
+        self.assertEqual(
+            sorted(ArchivedMessage.objects.values_list('message_body', flat=True)),
+            ['40 days ago', '50 days ago', '60 days ago']
+        )
+        self.assertEqual(Message.objects.count(), 3)
+
+    def test_last_message_stays_hot(self):
+        """Test a conversation's last message is never archived."""
+        quiet = Conversation.objects.create()
+        quiet.participants.add(self.user)
+        last = Message.objects.create(
+            conversation=quiet,
+            sender=self.user,
+            message_body='old but last',
+            sent_at=timezone.now() - timedelta(days=90)
+        )
+        call_command('archive_messages', stdout=StringIO())
+        self.assertTrue(Message.objects.filter(pk=last.pk).exists())
+        quiet.refresh_from_db()
+        self.assertEqual(quiet.last_message_id, last.message_id)
+
+    def test_days_below_setting_rejected(self):
+        """Test messages newer than the read boundary cannot be archived."""
+        with self.assertRaises(CommandError):
+            call_command('archive_messages', days=7, stdout=StringIO())
+        with override_settings(CHATS_ARCHIVE_AFTER_DAYS=None):
+            with self.assertRaises(CommandError):
+                call_command('archive_messages', stdout=StringIO())
+
+    def test_history_continues_into_archive(self):
+        """Test paging through history crosses into the archive."""
+        call_command('archive_messages', stdout=StringIO())
+        expected = [
+            f'{days_ago} days ago' for days_ago in (1, 2, 3, 40, 50, 60)
+        ]
+        conversation_url = (
+            f'/api/conversations/{self.conversation.conversation_id}/messages/'
+        )
+        self.assertEqual(self.bodies(conversation_url, 2), expected)
+        self.assertEqual(self.bodies('/api/messages/', 4), expected)
+        archived = ArchivedMessage.objects.get(message_body='60 days ago')
+        response = self.client.get(f'/api/messages/{archived.message_id}/')
+        self.assertEqual(response.data['message_body'], '60 days ago')
+
+    def test_unknown_message_not_found(self):
+        """Test an id in neither table is a 404."""
+        call_command('archive_messages', stdout=StringIO())
+        response = self.client.get(f'/api/messages/{uuid.uuid4()}/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_recent_page_skips_archive(self):
+        """Test pages within the hot boundary do not query the archive."""
+        call_command('archive_messages', stdout=StringIO())
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/messages/', {'page_size': 2})
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertFalse(
+            any('message_archive' in query['sql'] for query in queries)
+        )
+
+    def test_recent_window_includes_archive(self):
+        """Test the embedded window is topped up from the archive."""
+        call_command('archive_messages', stdout=StringIO())
+        response = self.client.get(
+            f'/api/conversations/{self.conversation.conversation_id}/'
+        )
+        self.assertEqual(
+            [m['message_body'] for m in response.data['messages']][-1],
+            '60 days ago'
+        )
+
+    @override_settings(CONVERSATION_RECENT_MESSAGES=7)
+    def test_recent_window_topped_up_once(self):
+        """Test a short window has no duplicates and no next link."""
+        call_command('archive_messages', stdout=StringIO())
+        response = self.client.get(
+            f'/api/conversations/{self.conversation.conversation_id}/'
+        )
+        self.assertEqual(
+            [m['message_body'] for m in response.data['messages']],
+            [f'{days_ago} days ago' for days_ago in (1, 2, 3, 40, 50, 60)]
+        )
+        self.assertIsNone(response.data['messages_next'])
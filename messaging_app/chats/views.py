@@ -1,17 +1,124 @@
 """
 Views for the messaging app.
 """
-from rest_framework import viewsets, status, filters
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Prefetch, Q, Subquery
+from django.db.models.functions import Coalesce
+from rest_framework import viewsets, status, filters, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import Conversation, Message
+from rest_framework.views import APIView
+from .archive import with_archive
+from .cache import cached_response, get_version, invalidate_conversations
+from .metrics import registry
+from .models import (
+    ArchivedMessage,
+    Conversation,
+    ConversationParticipant,
+    Message
+)
+from .pagination import MessageCursorPagination
+from .parsers import ChatsJSONParser, NDJSONParser
+from .realtime import publish_messages
+from .renderers import streaming_response
+from .search import MessageSearchFilter, search_messages
 from .serializers import (
     ConversationSerializer,
     ConversationListSerializer,
-    MessageSerializer
+    MessageBulkSerializer,
+    MessageSerializer,
+    MessageValuesSerializer
+)
+from .sharding import (
+    attach_last_messages,
+    attach_senders,
+    bulk_create_messages,
+    group_by_shard,
+    is_sharded,
+    sharded_messages
 )
 
 
+def unread_count(user):
+    """
+    Return a subquery counting messages the user has not read yet.
+
+    Messages newer than the participant's read cursor (or join time when
+    nothing has been read) are counted, excluding the user's own messages.
+    The count is a correlated aggregate evaluated in the page query and
+    served by the ``(conversation, -sent_at)`` index.
+    """
+    read_cursor = ConversationParticipant.objects.filter(
+        conversation=OuterRef(OuterRef('pk')),
+        participant=user
+    ).values(cursor=Coalesce('last_read_at', 'joined_at'))[:1]
+    unread = Message.objects.filter(
+        conversation=OuterRef('pk'),
+        sent_at__gt=Subquery(read_cursor)
+    ).exclude(sender=user).order_by().values('conversation').annotate(
+        count=Count('*')
+    ).values('count')
+    return Coalesce(Subquery(unread), 0)
+
+
+def attach_unread_counts(conversations, user):
+    """
+    Set ``unread_count`` on conversations whose messages are sharded.
+
+    Read cursors are loaded from ``default`` and each shard counts the
+    unread messages of its conversations in one grouped query.
+    """
+    cursors = dict(ConversationParticipant.objects.filter(
+        conversation__in=conversations,
+        participant=user
+    ).values_list('conversation_id', Coalesce('last_read_at', 'joined_at')))
+    counts = {}
+    for shard, ids in group_by_shard(cursors).items():
+        unread = Q()
+        for conversation_id in ids:
+            unread |= Q(
+                conversation_id=conversation_id,
+                sent_at__gt=cursors[conversation_id]
+            )
+        counts.update(
+            Message.objects.using(shard).filter(unread).exclude(
+                sender_id=user.pk
+            ).order_by().values('conversation_id').annotate(
+                count=Count('*')
+            ).values_list('conversation_id', 'count')
+        )
+    for conversation in conversations:
+        conversation.unread_count = counts.get(conversation.conversation_id, 0)
+
+
+def message_read_queryset(queryset, serializer_class):
+    """
+    Prepare a message queryset for ``serializer_class``.
+
+    Serializers working on ``.values()`` rows declare the columns they need
+    in ``values_fields``; model serializers get the sender joined instead.
+    """
+    values_fields = getattr(serializer_class, 'values_fields', None)
+    if values_fields:
+        return queryset.values(*values_fields)
+    if is_sharded():
+        # Users are not on the shards; see ``attach_senders``.
+        return queryset
+    return queryset.select_related('sender')
+
+
+def get_message_read_serializer(serializer_class):
+    """
+    Return the serializer for reading messages.
+
+    ``.values()`` serializers read sender columns through a join, which
+    sharded messages cannot do, so the model serializer is used instead.
+    """
+    if is_sharded() and getattr(serializer_class, 'values_fields', None):
+        return MessageSerializer
+    return serializer_class
+
+
 class ConversationViewSet(viewsets.ModelViewSet):
     """
     ViewSet for viewing and editing conversations.
@@ -20,8 +127,9 @@ class ConversationViewSet(viewsets.ModelViewSet):
     serializer_class = ConversationSerializer
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = []
-    ordering_fields = ['created_at']
-    ordering = ['-created_at']
+    ordering_fields = ['created_at', 'last_activity_at']
+    ordering = ['-last_activity_at']
+    message_serializer_class = MessageValuesSerializer
 
     def get_serializer_class(self):
         """Return appropriate serializer based on action."""
@@ -30,12 +138,113 @@ class ConversationViewSet(viewsets.ModelViewSet):
         return ConversationSerializer
 
     def get_queryset(self):
-        """Optionally filter conversations by participant."""
-        queryset = Conversation.objects.all()
+        """
+        Return the current user's conversations, optionally filtered by
+        another participant.
+
+        The rows are driven from the user's ``ConversationParticipant``
+        entries through the ``(participant, conversation)`` index; the pair
+        is unique, so the join yields each conversation once and no
+        ``DISTINCT`` is needed.
+        """
+        queryset = Conversation.objects.filter(
+            conversation_participants__participant_id=getattr(
+                self.request.user, 'user_id', None
+            )
+        )
         participant_id = self.request.query_params.get('participant', None)
         if participant_id:
             queryset = queryset.filter(participants__user_id=participant_id)
-        return queryset.distinct()
+        if self.action == 'list' and is_sharded():
+            # Last messages and unread counts are set per page.
+            queryset = queryset.prefetch_related('participants')
+        elif self.action == 'list':
+            queryset = queryset.select_related(
+                'last_message__sender'
+            ).prefetch_related('participants')
+            if self.request.user.is_authenticated:
+                queryset = queryset.annotate(
+                    unread_count=unread_count(self.request.user)
+                )
+        elif self.action == 'retrieve' and is_sharded():
+            # The serializer loads the recent window from the shard.
+            queryset = queryset.prefetch_related('participants')
+        elif self.action == 'retrieve':
+            # One extra row tells the serializer whether older messages exist.
+            limit = ConversationSerializer.recent_messages_limit() + 1
+            queryset = queryset.prefetch_related(
+                'participants',
+                Prefetch(
+                    'messages',
+                    queryset=Message.objects.latest_per_conversation(limit),
+                    to_attr='recent_messages'
+                )
+            )
+        return queryset
+
+    def paginate_queryset(self, queryset):
+        """Load sharded last messages and unread counts for the page."""
+        page = super().paginate_queryset(queryset)
+        if page is not None and self.action == 'list' and is_sharded():
+            attach_last_messages(page)
+            if self.request.user.is_authenticated:
+                attach_unread_counts(page, self.request.user)
+        return page
+
+    def list(self, request, *args, **kwargs):
+        """List conversations, cached until the user's inbox changes."""
+        user_id = getattr(request.user, 'user_id', None)
+        return cached_response(
+            request,
+            [
+                'list', user_id, get_version('user', user_id),
+                request.accepted_renderer.format, request.get_full_path()
+            ],
+            lambda: super(ConversationViewSet, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        """Retrieve a conversation, cached until it changes."""
+        pk = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        return cached_response(
+            request,
+            [
+                'detail', getattr(request.user, 'user_id', None), pk,
+                get_version('conversation', pk),
+                request.accepted_renderer.format, request.get_full_path()
+            ],
+            lambda: super(ConversationViewSet, self).retrieve(request, *args, **kwargs)
+        )
+
+    def perform_create(self, serializer):
+        """Create the conversation and invalidate participants' inboxes."""
+        conversation = serializer.save()
+        invalidate_conversations([conversation.conversation_id])
+
+    @action(detail=True, methods=['get'])
+    def messages(self, request, pk=None):
+        """List a conversation's message history, newest first."""
+        conversation = self.get_object()
+        serializer_class = get_message_read_serializer(
+            self.message_serializer_class
+        )
+        queryset = message_read_queryset(
+            with_archive(
+                conversation.messages.all(),
+                conversation.archived_messages.all()
+            ),
+            serializer_class
+        )
+        paginator = MessageCursorPagination()
+        page = paginator.paginate_queryset(queryset, request)
+        if is_sharded():
+            page = attach_senders(page)
+        serializer = serializer_class(
+            page, many=True, context=self.get_serializer_context()
+        )
+        return streaming_response(
+            request, paginator.get_paginated_response(serializer.data)
+        )
 
     @action(detail=True, methods=['post'])
     def send_message(self, request, pk=None):
@@ -49,10 +258,29 @@ class ConversationViewSet(viewsets.ModelViewSet):
             }
         )
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                message = serializer.save(sender=request.user)
+                publish_messages([message])
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=True, methods=['post'])
+    def mark_read(self, request, pk=None):
+        """Move the current user's read cursor to the latest message."""
+        conversation = self.get_object()
+        participation = ConversationParticipant.objects.get(
+            conversation=conversation,
+            participant_id=request.user.user_id
+        )
+        last_msg = conversation.messages.only('sent_at').first()
+        if last_msg and (
+            participation.last_read_at is None
+            or last_msg.sent_at > participation.last_read_at
+        ):
+            participation.last_read_at = last_msg.sent_at
+            participation.save(update_fields=['last_read_at'])
+        return Response({'last_read_at': participation.last_read_at})
+
 
 class MessageViewSet(viewsets.ModelViewSet):
     """
@@ -60,23 +288,204 @@ class MessageViewSet(viewsets.ModelViewSet):
     """
     queryset = Message.objects.all()
     serializer_class = MessageSerializer
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = MessageCursorPagination
+    filter_backends = [MessageSearchFilter, filters.OrderingFilter]
     search_fields = ['message_body']
     ordering_fields = ['sent_at', 'message_body']
-    ordering = ['-sent_at']
+    ordering = ['-sent_at', '-message_id']
+    bulk_max_items = 5000
+    bulk_batch_size = 500
+    search_max_results = 100
+    read_serializer_class = MessageValuesSerializer
+
+    def get_serializer_class(self):
+        """Use the read-optimized serializer, if any, for listing."""
+        if self.action == 'list' and self.read_serializer_class is not None:
+            return get_message_read_serializer(self.read_serializer_class)
+        return super().get_serializer_class()
+
+    def list(self, request, *args, **kwargs):
+        """List messages, streaming large pages."""
+        return streaming_response(
+            request, super().list(request, *args, **kwargs)
+        )
 
     def get_queryset(self):
-        """Optionally filter messages by conversation."""
-        queryset = Message.objects.all()
+        """
+        Return messages from the current user's conversations, optionally
+        filtered by conversation.
+
+        Membership is a correlated ``EXISTS`` on the participant pair, so the
+        message scan is never multiplied by a join. With sharded messages
+        the user's conversations are looked up first and every shard is
+        queried for its share of them. Archived messages follow the hot ones.
+        """
+        user_id = getattr(self.request.user, 'user_id', None)
         conversation_id = self.request.query_params.get('conversation', None)
-        if conversation_id:
-            queryset = queryset.filter(conversation__conversation_id=conversation_id)
-        return queryset
+        if is_sharded():
+            memberships = ConversationParticipant.objects.filter(
+                participant_id=user_id
+            )
+            if conversation_id:
+                memberships = memberships.filter(conversation_id=conversation_id)
+            conversation_ids = list(
+                memberships.values_list('conversation_id', flat=True)
+            )
+            querysets = [
+                sharded_messages(conversation_ids, model)
+                for model in (Message, ArchivedMessage)
+            ]
+        else:
+            querysets = []
+            for model in (Message, ArchivedMessage):
+                queryset = model.objects.filter(
+                    Exists(ConversationParticipant.objects.filter(
+                        conversation=OuterRef('conversation'),
+                        participant_id=user_id
+                    ))
+                )
+                if conversation_id:
+                    queryset = queryset.filter(
+                        conversation__conversation_id=conversation_id
+                    )
+                querysets.append(queryset)
+        return message_read_queryset(
+            with_archive(*querysets), self.get_serializer_class()
+        )
+
+    def paginate_queryset(self, queryset):
+        """Attach senders to sharded pages."""
+        page = super().paginate_queryset(queryset)
+        if page is not None and is_sharded():
+            page = attach_senders(page)
+        return page
 
     def perform_create(self, serializer):
         """Set sender to current user if available."""
-        if hasattr(self.request.user, 'user_id'):
-            serializer.save(sender=self.request.user)
+        with transaction.atomic():
+            if hasattr(self.request.user, 'user_id'):
+                message = serializer.save(sender=self.request.user)
+            else:
+                message = serializer.save()
+            publish_messages([message])
+
+    @action(detail=False, methods=['get'], url_path='search')
+    def ranked_search(self, request):
+        """
+        Search the user's conversations, best matches first.
+
+        Accepts ``search`` terms, an optional ``conversation`` id and a
+        ``limit`` of at most ``search_max_results``.
+        """
+        terms = MessageSearchFilter().get_search_terms(request)
+        if not terms:
+            return Response(
+                {'detail': 'The search parameter is required.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = int(request.query_params.get('limit', 20))
+        except ValueError:
+            return Response(
+                {'detail': 'limit must be an integer.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = max(1, min(limit, self.search_max_results))
+        results = search_messages(
+            self.get_queryset(), terms, ranked=True
+        )[:limit]
+        if is_sharded():
+            results = attach_senders(results)
+        serializer = self.get_serializer(results, many=True)
+        return Response({'results': serializer.data})
+
+    @action(detail=False, methods=['post'], parser_classes=[ChatsJSONParser, NDJSONParser])
+    def bulk(self, request):
+        """
+        Create many messages from a JSON list or an NDJSON stream.
+
+        Every item is validated and checked for conversation membership,
+        valid items are inserted in chunks inside one transaction, and a
+        result is returned per item in request order.
+        """
+        items = request.data
+        if not isinstance(items, list):
+            return Response(
+                {'detail': 'Expected a list of messages.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(items) > self.bulk_max_items:
+            return Response(
+                {'detail': f'At most {self.bulk_max_items} messages per request.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        results = []
+        valid = []
+        for index, item in enumerate(items):
+            serializer = MessageBulkSerializer(data=item)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+                results.append(None)
+            else:
+                results.append({
+                    'index': index,
+                    'status': status.HTTP_400_BAD_REQUEST,
+                    'errors': serializer.errors
+                })
+
+        member_of = set(ConversationParticipant.objects.filter(
+            participant=request.user,
+            conversation_id__in={data['conversation'] for _, data in valid}
+        ).values_list('conversation_id', flat=True))
+
+        messages = []
+        for index, data in valid:
+            if data['conversation'] not in member_of:
+                results[index] = {
+                    'index': index,
+                    'status': status.HTTP_403_FORBIDDEN,
+                    'errors': {'conversation': [
+                        'You are not a participant in this conversation.'
+                    ]}
+                }
+                continue
+            message = Message(
+                sender=request.user,
+                conversation_id=data['conversation'],
+                message_body=data['message_body']
+            )
+            messages.append(message)
+            results[index] = {
+                'index': index,
+                'status': status.HTTP_201_CREATED,
+                'message_id': message.message_id
+            }
+
+        with transaction.atomic():
+            bulk_create_messages(messages, batch_size=self.bulk_batch_size)
+            Message.objects.record_activity(messages)
+            publish_messages(messages)
+            invalidate_conversations(message.conversation_id for message in messages)
+
+        if len(messages) == len(items):
+            response_status = status.HTTP_201_CREATED
         else:
-            serializer.save()
+            response_status = status.HTTP_207_MULTI_STATUS
+        return streaming_response(
+            request, Response({'results': results}, status=response_status)
+        )
+
+
+class MetricsView(APIView):
+    """
+    Aggregated request metrics per view and action.
+
+    Each metric is a histogram with cumulative bucket counts, as recorded by
+    ``PerformanceMiddleware``. Only staff users may read them.
+    """
+    permission_classes = [permissions.IsAdminUser]
 
+    def get(self, request):
+        """Return a snapshot of every histogram."""
+        return Response(registry.snapshot())
@@ -1,5 +1,8 @@
 """
 ASGI config for messaging_app project.
+
+HTTP requests are served by Django; websocket connections are routed to the
+realtime message stream in ``chats.realtime``.
 """
 
 import os
@@ -8,5 +11,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'messaging_app.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from chats.realtime import websocket_application  # noqa: E402
+
 
+async def application(scope, receive, send):
+    """Dispatch websocket connections to the message stream."""
+    if scope['type'] == 'websocket':
+        await websocket_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -34,11 +34,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'chats.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'chats.middleware.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -63,6 +65,8 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'messaging_app.wsgi.application'
 
+ASGI_APPLICATION = 'messaging_app.asgi.application'
+
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
@@ -71,9 +75,68 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+    },
+    # Stands in for a streaming replica of ``default`` locally and in tests;
+    # list it in CHATS_DATABASE_REPLICAS to route reads to it.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.replica.sqlite3',
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+    },
+    # Message shards; list them in CHATS_MESSAGE_SHARDS to spread messages
+    # across them by conversation.
+    'messages_0': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.messages_0.sqlite3',
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+    },
+    'messages_1': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.messages_1.sqlite3',
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+    },
+}
+
+DATABASE_ROUTERS = ['chats.routers.ShardRouter', 'chats.routers.ReplicaRouter']
+
+# Aliases holding messages, each conversation hashed to one of them; run
+# rebalance_messages after changing the list
+CHATS_MESSAGE_SHARDS = []
+
+# Days after which archive_messages may move messages to the archive table;
+# None keeps every message in the hot table
+CHATS_ARCHIVE_AFTER_DAYS = None
+
+# Aliases serving safe-method requests, taken in turn
+CHATS_DATABASE_REPLICAS = []
+
+# Seconds a replica that failed to connect is skipped
+CHATS_REPLICA_RETRY_SECONDS = 30
+
+# Seconds a client stays on the primary after writing
+CHATS_READ_YOUR_WRITES_SECONDS = 5
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Local memory is per process; point this at a shared backend such as
+# django.core.cache.backends.redis.RedisCache when running several workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'messaging-app',
     }
 }
 
+# Seconds to keep cached conversation list and detail responses (0 disables)
+CHATS_RESPONSE_CACHE_TIMEOUT = 300
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -127,7 +190,35 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # orjson is used when installed, with a stdlib fallback
+    'DEFAULT_RENDERER_CLASSES': [
+        'chats.renderers.ChatsJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'chats.parsers.ChatsJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10
 }
 
+# Number of recent messages embedded in a conversation detail response
+CONVERSATION_RECENT_MESSAGES = 20
+
+
+# List responses with at least this many items are streamed (0 disables)
+CHATS_STREAMING_MIN_ITEMS = 100
+
+
+# Most SQL queries each view may run, e.g. {'ConversationViewSet.list': 5};
+# requests over budget raise. Meant for tests, empty in production.
+CHATS_QUERY_BUDGETS = {}
+
+# Per-request timings are logged as JSON lines on the 'chats.performance'
+# logger at INFO level; configure LOGGING to ship them.
+
+
+# Publish/subscribe broker used for realtime message delivery
+CHATS_REALTIME_BROKER = 'chats.realtime.InMemoryBroker'